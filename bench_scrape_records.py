@@ -0,0 +1,81 @@
+"""วัดหน่วยความจำของรายการหลักสูตรที่ scraper เก็บไว้ ต่อ 10,000 หลักสูตร
+dict แบบเดิม (มี raw_text) เทียบกับ ProgramRecord/ProgramDetails แบบ __slots__ ที่ intern สตริงซ้ำ
+
+    python bench_scrape_records.py [จำนวนหลักสูตร]
+"""
+import sys
+import tracemalloc
+
+from scrape_tuition import ProgramDetails, ProgramRecord
+
+KEYWORDS = ["วิศวกรรม ปัญญาประดิษฐ์", "วิศวกรรม คอมพิวเตอร์", "วิทยาการข้อมูล", "วิศวกรรม ซอฟต์แวร์"]
+UNIVERSITIES = [f"มหาวิทยาลัยตัวอย่าง {i} วิทยาเขตหลัก" for i in range(80)]
+FACULTIES = [f"คณะวิศวกรรมศาสตร์ > สาขาวิชาที่ {i}" for i in range(40)]
+FEES = ["ค่าธรรมเนียมการศึกษา (ชาวไทย) 25,000 บาท/เทอม", "อัตราค่าเล่าเรียน 21,000 บาท ต่อภาคการศึกษา", "ไม่พบข้อมูล"]
+
+
+def search_texts(n):
+    """ข้อความของรายการค้นหาแบบที่อ่านได้จาก DOM: ทุกรายการเป็นสตริงใหม่ แม้ค่าจะซ้ำกัน"""
+    for i in range(n):
+        yield (
+            KEYWORDS[i % len(KEYWORDS)],
+            f"หลักสูตรวิศวกรรมศาสตรบัณฑิต สาขาวิชาที่ {i % 500} (หลักสูตรปกติ)\n"
+            f"{FACULTIES[i % len(FACULTIES)]}\n{UNIVERSITIES[i % len(UNIVERSITIES)]}\n"
+            f"รอบ 1 Portfolio รอบ 3 Admission รับ {i % 90} คน",
+            f"https://course.mytcas.com/programs/{10000000000000 + i}",
+        )
+
+
+def split_text(keyword, text):
+    lines = text.splitlines()
+    return "".join(keyword), lines[0], lines[1], lines[2]
+
+
+def legacy_records(n):
+    programs, details = [], []
+    for i, (keyword, text, url) in enumerate(search_texts(n)):
+        keyword, name, faculty, university = split_text(keyword, text)
+        programs.append({"keyword": keyword, "program_name": name, "faculty": faculty,
+                         "university": university, "url": url, "raw_text": text})
+        details.append({"keyword": keyword, "program_name": name, "faculty": faculty, "university": university,
+                        "program_type": "".join("ภาษาไทย ปกติ"), "tuition_fee": "".join(FEES[i % len(FEES)]),
+                        "url": url, "scrape_time": f"2025-07-28 02:{i % 60:02d}:00"})
+    return programs, details
+
+
+def slotted_records(n, keep_raw_text=False):
+    programs, details = [], []
+    for i, (keyword, text, url) in enumerate(search_texts(n)):
+        keyword, name, faculty, university = split_text(keyword, text)
+        program = ProgramRecord(keyword, name, faculty, university, url, raw_text=text, keep_raw_text=keep_raw_text)
+        programs.append(program)
+        details.append(ProgramDetails(program.keyword, program.program_name, program.faculty, program.university,
+                                      url, "".join("ภาษาไทย ปกติ"), "".join(FEES[i % len(FEES)]),
+                                      f"2025-07-28 02:{i % 60:02d}:00"))
+    return programs, details
+
+
+def measure(build, n):
+    """หน่วยความจำที่ยังถูกใช้หลังสร้างรายการ (ไม่รวมข้อมูลตั้งต้นที่สร้างทิ้ง) หน่วย MB"""
+    tracemalloc.start()
+    records = build(n)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return current / 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    scale = 10_000 / n
+    print(f"หน่วยความจำต่อ 10,000 หลักสูตร (วัดจาก {n:,} หลักสูตร, รายการค้นหา + รายละเอียด):")
+    for label, build in [
+        ("dict + raw_text (เดิม)", legacy_records),
+        ("__slots__ + intern, ทิ้ง raw_text", slotted_records),
+        ("__slots__ + intern, raw_text บีบอัด", lambda k: slotted_records(k, keep_raw_text=True)),
+    ]:
+        print(f"  {label:<36}: {measure(build, n) * scale:8.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
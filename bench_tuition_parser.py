@@ -0,0 +1,84 @@
+"""เปรียบเทียบความเร็วระหว่างการ parse ค่าเล่าเรียนแบบเดิม (Series.apply ทีละแถว)
+กับ parse_tuition_fees (parse เฉพาะข้อความที่ไม่ซ้ำ) บนชุดข้อความสังเคราะห์ขนาดใหญ่
+
+    python bench_tuition_parser.py [จำนวนแถว]
+"""
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from tuition_parser import parse_tuition_fees
+
+TEMPLATES = [
+    "ค่าธรรมเนียมการศึกษา (ชาวไทย) {a} บาท/เทอม",
+    "{c}",
+    "อัตราค่าเล่าเรียน {c}.-/ภาคการศึกษา",
+    "อัตราค่าเล่าเรียน {c} บาทต่อภาคการศึกษา (เรียน 8 ภาคการศึกษา) หรือตลอดหลักสูตร {p} บาท",
+    "{c} ต่อภาคเรียน",
+    "อัตราค่าเล่าเรียน {c} บาท ตลอดหลักสูตร",
+    "เทอมละ {c} บาท ตลอดหลักสูตร {p} บาท",
+    "ดูรายละเอียดเพิ่มเติม https://www.example.ac.th/tuition-and-fees/",
+    "ค่าเล่าเรียนตลอดหลักสูตร {a} บาท (นักศึกษาต่างชาติ)",
+    "ไม่พบข้อมูล",
+]
+
+
+def legacy_parse_tuition_fee(fee_str):
+    """วิธีเดิมใน load_data: ตัวเลขแรกที่พบ ไม่สนใจหน่วย"""
+    if isinstance(fee_str, str):
+        numbers = re.findall(r'\d[\d,\.]*', fee_str)
+        if numbers:
+            try:
+                return float(numbers[0].replace(',', ''))
+            except ValueError:
+                return None
+    return None
+
+
+def make_corpus(n, seed=0, distinct=False):
+    """distinct=False: จำนวนเงินซ้ำกันตามจริง (ขั้นละ 500 บาท), True: แทบไม่มีข้อความซ้ำ (กรณีแย่สุด)"""
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(5_000, 10_000_000, size=n) if distinct else rng.integers(10, 200, size=n) * 500
+    picks = rng.integers(0, len(TEMPLATES), size=n)
+    return pd.Series([
+        TEMPLATES[t].format(a=a, c=f"{a:,}", p=f"{a * 8:,}")
+        for t, a in zip(picks, amounts)
+    ])
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(n, distinct):
+    corpus = make_corpus(n, distinct=distinct)
+    print(f"ชุดข้อความสังเคราะห์: {n:,} แถว, ข้อความไม่ซ้ำ {corpus.nunique():,} แบบ")
+
+    legacy_time, legacy = timed(lambda: corpus.apply(legacy_parse_tuition_fee))
+    parsed_time, parsed = timed(lambda: parse_tuition_fees(corpus))
+
+    print(f"  apply (เดิม)       : {legacy_time:8.3f} s  ({n / legacy_time:,.0f} แถว/s)")
+    print(f"  factorize (ใหม่)   : {parsed_time:8.3f} s  ({n / parsed_time:,.0f} แถว/s)")
+    print(f"  เร็วขึ้น            : {legacy_time / parsed_time:8.2f}x")
+
+    same_amount = (legacy == parsed['tuition_fee_amount']) | (legacy.isna() & parsed['tuition_fee_amount'].isna())
+    print(f"  จำนวนเงินตรงกับวิธีเดิม: {same_amount.mean():.1%}")
+    print("  หน่วยที่พบ:", parsed['tuition_fee_unit'].value_counts(dropna=False).to_dict())
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    run(n, distinct=False)
+    run(n, distinct=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,57 +1,594 @@
 import pandas as pd
+import numpy as np
 import dash
 from dash import dcc, html, dash_table
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import plotly.express as px
-import re
 import os
+import re
+import bisect
+import glob
+import time
+import hashlib
+import threading
+import itertools
+import importlib.util
+import unicodedata
+from functools import lru_cache
+from tuition_parser import parse_tuition_fees
+from scrape_store import HistoryStore
+from dashboard_metrics import CallbackMetrics
 
 # --- 1. โหลดและเตรียมข้อมูล ---
-def load_data(file_path='mytcas_scrape.xlsx'):
+INDEXED_COLUMNS = ['keyword', 'university', 'faculty', 'program_type']
+EMPTY_COLUMNS = ['program_name', 'university', 'faculty', 'tuition_fee', 'program_type', 'tuition_fee_numeric', 'keyword']
+
+# แคชข้อมูลที่เตรียมแล้วในรูปแบบ columnar (Feather ผ่าน pyarrow) ผูกกับ hash ของไฟล์ต้นทาง
+# เปลี่ยน PREPARE_VERSION เมื่อแก้ขั้นตอนใน prepare_data เพื่อไม่ให้ใช้แคชเก่า
+CACHE_DIR = '.dashboard_cache'
+DATA_FILE = 'mytcas_scrape.xlsx'
+PREPARE_VERSION = 4
+
+def prepare_data(df):
+    """แปลงข้อมูลดิบจากไฟล์ที่ scraper บันทึกให้พร้อมใช้ใน dashboard"""
+    # แยกจำนวนเงิน หน่วย (ภาคการศึกษา/ปี/ตลอดหลักสูตร) กลุ่มผู้เรียน และลิงก์ แล้วปรับเป็นค่าต่อปี
+    fees = parse_tuition_fees(df['tuition_fee'])
+    df = df.join(fees)
+    df['tuition_fee_numeric'] = df['tuition_fee_per_year']
+
+    # เก็บหลักสูตรที่มีเพียงลิงก์รายละเอียดค่าเล่าเรียน หรือจำนวนเงินที่ไม่ระบุหน่วย (ไม่มีค่าต่อปี) ไว้ด้วย
+    # แถวเหล่านี้แสดงในตารางได้ แต่ไม่ถูกนับในกราฟค่าเทอมต่อปี
+    df = df[df['tuition_fee_numeric'].notna() | df['tuition_fee_amount'].notna() | df['tuition_fee_url'].notna()]
+    df = df.dropna(subset=['program_name', 'university', 'keyword'])
+    
+    df['faculty'] = df['faculty'].fillna('ไม่ระบุคณะ')
+    df['program_type'] = df['program_type'].fillna('ไม่ระบุประเภท')
+
+    # *** การเปลี่ยนแปลงที่นี่: สร้าง unique_id สำหรับ value และ display_text สำหรับ label ***
+    # unique_id ยังคงเป็นข้อความเต็มเพื่อให้ระบุหลักสูตรได้อย่างเฉพาะเจาะจง
+    df['unique_id'] = df['program_name'] + " - " + df['university'] + " (" + df['faculty'] + ")"
+    
+    # สร้างคอลัมน์ใหม่สำหรับข้อความที่แสดงใน Dropdown (label)
+    # โดยอาจจะตัดให้สั้นลง หรือเลือกแสดงเฉพาะชื่อหลักสูตรและมหาวิทยาลัย
+    # ตัวอย่าง: แสดงเฉพาะชื่อหลักสูตร และเพิ่มชื่อมหาวิทยาลัยถ้าไม่ซ้ำกัน
+    df['display_text'] = df['program_name'] + " (" + df['university'] + ")"
+    
+    df = df.sort_values(by=['program_name', 'university']).reset_index(drop=True)
+
+    # คอลัมน์ที่ใช้กรองเก็บเป็น categorical (รหัสตัวเลข + รายการค่าที่เรียงแล้ว) เพื่อสร้าง inverted index
+    for col in INDEXED_COLUMNS:
+        df[col] = df[col].astype('category')
+    return df
+
+def file_digest(file_path):
+    h = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_path_for(file_path):
+    """ไฟล์แคชของ file_path (None หากไม่มี pyarrow)"""
+    if importlib.util.find_spec('pyarrow') is None:
+        return None
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(CACHE_DIR, f"{name}.v{PREPARE_VERSION}.{file_digest(file_path)[:16]}.feather")
+
+def read_cached_data(cache_path):
+    from pyarrow import feather
+    return feather.read_feather(cache_path, memory_map=True)
+
+def write_cached_data(df, cache_path):
+    """บันทึกแคชแบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename) และลบแคชเก่าของไฟล์ต้นทางเดียวกัน"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    prefix = os.path.basename(cache_path).split('.v')[0] + '.v'
+    for old in os.listdir(CACHE_DIR):
+        if old.startswith(prefix) and old.endswith('.feather'):
+            os.remove(os.path.join(CACHE_DIR, old))
+    # หลาย worker อาจเตรียมไฟล์เดียวกันพร้อมกัน: ใช้ไฟล์ชั่วคราวแยกตามโพรเซส
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    # ไม่บีบอัด: read_feather(memory_map=True) อ้างถึงข้อมูลคอลัมน์ใน page cache ของไฟล์ได้โดยตรง
+    # (ไฟล์ที่บีบอัดด้วย LZ4 ต้องคลายลงหน่วยความจำของแต่ละโพรเซส worker จึงใช้ page ร่วมกันไม่ได้)
+    df.to_feather(tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path)
+
+def load_data(file_path=DATA_FILE, use_cache=True):
     if not os.path.exists(file_path):
         print(f"❌ Error: ไม่พบไฟล์ '{file_path}'. กรุณาตรวจสอบว่าไฟล์อยู่ในไดเรกทอรีเดียวกันกับสคริปต์.")
-        return pd.DataFrame(columns=['program_name', 'university', 'faculty', 'tuition_fee', 'program_type', 'tuition_fee_numeric', 'keyword'])
+        return pd.DataFrame(columns=EMPTY_COLUMNS)
     
     try:
+        cache_path = cache_path_for(file_path) if use_cache else None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                df = read_cached_data(cache_path)
+                print(f"✔️ โหลดข้อมูลจากแคช '{cache_path}' สำเร็จ. จำนวนแถว: {len(df)}")
+                return df
+            except Exception as e:
+                print(f"⚠️ อ่านแคชไม่สำเร็จ ({e}) จะเตรียมข้อมูลจากไฟล์ต้นทางใหม่")
+
         df = pd.read_excel(file_path)
         print(f"✔️ โหลดข้อมูลจาก '{file_path}' สำเร็จ. จำนวนแถว: {len(df)}")
-        
-        def parse_tuition_fee(fee_str):
-            if isinstance(fee_str, str):
-                numbers = re.findall(r'\d[\d,\.]*', fee_str)
-                if numbers:
-                    try:
-                        return float(numbers[0].replace(',', ''))
-                    except ValueError:
-                        return None
-            return None
-
-        df['tuition_fee_numeric'] = df['tuition_fee'].apply(parse_tuition_fee)
-        
-        df.dropna(subset=['program_name', 'university', 'tuition_fee_numeric', 'keyword'], inplace=True)
-        
-        df['faculty'] = df['faculty'].fillna('ไม่ระบุคณะ')
-        df['program_type'] = df['program_type'].fillna('ไม่ระบุประเภท')
-
-        # *** การเปลี่ยนแปลงที่นี่: สร้าง unique_id สำหรับ value และ display_text สำหรับ label ***
-        # unique_id ยังคงเป็นข้อความเต็มเพื่อให้ระบุหลักสูตรได้อย่างเฉพาะเจาะจง
-        df['unique_id'] = df['program_name'] + " - " + df['university'] + " (" + df['faculty'] + ")"
-        
-        # สร้างคอลัมน์ใหม่สำหรับข้อความที่แสดงใน Dropdown (label)
-        # โดยอาจจะตัดให้สั้นลง หรือเลือกแสดงเฉพาะชื่อหลักสูตรและมหาวิทยาลัย
-        # ตัวอย่าง: แสดงเฉพาะชื่อหลักสูตร และเพิ่มชื่อมหาวิทยาลัยถ้าไม่ซ้ำกัน
-        df['display_text'] = df['program_name'] + " (" + df['university'] + ")"
-        
-        df.sort_values(by=['program_name', 'university'], inplace=True)
-        
+        df = prepare_data(df)
+
+        if cache_path:
+            try:
+                write_cached_data(df, cache_path)
+            except Exception as e:
+                print(f"⚠️ บันทึกแคชไม่สำเร็จ: {e}")
         return df
     except Exception as e:
         print(f"❌ Error ในการโหลดหรือเตรียมข้อมูล: {e}")
-        return pd.DataFrame(columns=['program_name', 'university', 'faculty', 'tuition_fee', 'program_type', 'tuition_fee_numeric', 'keyword'])
+        return pd.DataFrame(columns=EMPTY_COLUMNS)
+
+# --- 2. ชั้นกรองข้อมูลที่ใช้ร่วมกันทุก callback ---
+# ผลการกรองเก็บเป็นตำแหน่งแถว (numpy array) ใน LRU cache ตามชุดตัวกรองที่ normalize แล้ว
+# ทำให้ callback ที่ถูกเรียกพร้อมกันจากการคลิกครั้งเดียวใช้ผลเดียวกัน และไม่ต้อง copy ทั้ง DataFrame
+def normalize_selection(values):
+    """คืน None เมื่อไม่ได้กรอง (ว่างหรือมี 'all') ไม่เช่นนั้นคืน tuple ที่เรียงแล้ว"""
+    if not values or 'all' in values:
+        return None
+    return tuple(sorted(set(values)))
+
+EMPTY_POSITIONS = np.array([], dtype=np.int64)
+PROGRAM_OPTION_LIMIT = 50  # จำนวนตัวเลือกหลักสูตรสูงสุดที่ส่งให้ dropdown ต่อการพิมพ์หนึ่งครั้ง
+TABLE_COLUMNS = ['program_name', 'university', 'faculty', 'program_type', 'tuition_fee', 'keyword']
+TABLE_HEADERS = {'program_name': 'ชื่อหลักสูตร', 'university': 'มหาวิทยาลัย', 'faculty': 'คณะ',
+                 'program_type': 'ประเภทหลักสูตร', 'tuition_fee': 'ค่าใช้จ่าย', 'keyword': 'คำค้นหลัก'}
+# คอลัมน์ที่ส่งให้ browser สร้างกราฟเปรียบเทียบและสรุปหลักสูตรที่เลือกเอง (clientside callback)
+# unique_id ไม่ถูกส่ง เพราะ browser ประกอบจาก program_name, university และ faculty ได้เหมือนใน prepare_data
+COMPARISON_COLUMNS = ['program_name', 'university', 'faculty', 'program_type', 'tuition_fee',
+                      'tuition_fee_unit', 'tuition_fee_numeric']
+
+# ค้นหาหลักสูตรแบบไม่สนช่องว่าง (ภาษาไทยมักพิมพ์ติดกัน) ตัวพิมพ์ใหญ่เล็ก และอักขระความกว้างศูนย์
+# สระอำที่พิมพ์แยกเป็น นิคหิต + สระอา และวรรณยุกต์ที่พิมพ์ก่อนสระบน ถูกจัดให้อยู่ในรูปเดียวกัน
+SEARCH_IGNORED_CHARS = re.compile('[\\s\u200b\u200c\u200d\u2060\ufeff]+')
+THAI_TONE_BEFORE_VOWEL = re.compile('([\u0e48-\u0e4b])([\u0e31\u0e34-\u0e37\u0e47])')
+
+def normalize_search_text(text):
+    if not text:
+        return ''
+    text = SEARCH_IGNORED_CHARS.sub('', unicodedata.normalize('NFC', str(text)))
+    return THAI_TONE_BEFORE_VOWEL.sub(r'\2\1', text.replace('\u0e4d\u0e32', '\u0e33')).casefold()
+
+def build_filter_index(frame):
+    """Inverted index: {คอลัมน์: {ค่า: ตำแหน่งแถวที่เรียงจากน้อยไปมาก}} สร้างจากรหัส categorical ครั้งเดียวตอนโหลด"""
+    index = {}
+    for col in INDEXED_COLUMNS:
+        if col not in frame or not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            continue
+        codes = frame[col].cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable')  # stable: ตำแหน่งในแต่ละค่ายังเรียงอยู่
+        bounds = np.searchsorted(codes[order], np.arange(len(frame[col].cat.categories) + 1))
+        index[col] = {
+            value: order[bounds[i]:bounds[i + 1]]
+            for i, value in enumerate(frame[col].cat.categories)
+        }
+    return index
+
+# Cube ของค่าเทอม: sum/count/min/max ต่อกลุ่ม (keyword, university, faculty, program_type) สร้างครั้งเดียวตอนโหลด
+# กราฟภาพรวมและสรุปตามตัวกรองรวมผลจากกลุ่มเหล่านี้ (จำนวนกลุ่ม) แทนการ groupby ทุกแถวที่ผ่านตัวกรองทุกครั้ง
+CUBE_MEASURES = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max', 'rows': 'sum'}
+
+def build_aggregate_cube(frame):
+    dims = [col for col in INDEXED_COLUMNS if col in frame]
+    if not dims or 'tuition_fee_numeric' not in frame:
+        return pd.DataFrame(columns=INDEXED_COLUMNS + list(CUBE_MEASURES))
+    fees = frame.groupby(dims, observed=True, sort=True)['tuition_fee_numeric']
+    cube = fees.agg(['sum', 'count', 'min', 'max', 'size']).rename(columns={'size': 'rows'})
+    return cube.reset_index()
+
+class DashboardData:
+    """ข้อมูลที่เตรียมแล้วหนึ่งชุด พร้อม inverted index และ cache ผลการกรองของชุดนั้น
+    เมื่อมีไฟล์ใหม่จะสร้าง object ใหม่แล้วสลับทั้งก้อน callback จึงไม่เห็นข้อมูลกับ index คนละรุ่นกัน"""
+
+    def __init__(self, df, source=None, signature=None, version=0):
+        self.df = df
+        self.source = source
+        self.signature = signature  # (mtime, size) ของไฟล์ต้นทาง ใช้ตรวจว่ามีไฟล์ใหม่หรือไม่
+        self.version = version
+        self.filter_index = build_filter_index(df)
+        self._filtered_positions = lru_cache(maxsize=256)(self._compute_positions)
+        self.aggregates = build_aggregate_cube(df)
+        self._rollups = lru_cache(maxsize=256)(self._compute_rollup)
+        # ดัชนีค้นหาหลักสูตร: display_text ที่ normalize แล้วต่อแถว, ลำดับแถวที่เรียงตามข้อความนั้น
+        # (หาแถวที่ขึ้นต้นด้วยคำค้นด้วย binary search) และข้อความทุกแถวต่อกันสำหรับหา substring ด้วย str.find
+        texts = df['display_text'].tolist() if 'display_text' in df else []
+        normalized = {text: normalize_search_text(text) for text in set(texts)}
+        self.search_keys = np.array([normalized[text] for text in texts], dtype=object)
+        self.search_order = np.argsort(self.search_keys, kind='stable')
+        self.sorted_search_keys = self.search_keys[self.search_order]
+        self.search_blob = '\n'.join(self.search_keys)
+        self.search_offsets = list(itertools.accumulate((len(key) + 1 for key in self.search_keys), initial=0))
+        self.rows_by_id = pd.Index(df['unique_id']) if 'unique_id' in df else pd.Index([])
+
+    def _positions_for(self, column, values):
+        """รวมตำแหน่งแถวของทุกค่าที่เลือกในคอลัมน์เดียว (union)"""
+        arrays = [self.filter_index[column].get(v, EMPTY_POSITIONS) for v in values]
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.sort(np.concatenate(arrays))
+
+    def _compute_positions(self, keyword, universities, faculties, program_types=None):
+        selections = [
+            ('keyword', (keyword,) if keyword is not None else None),
+            ('university', universities),
+            ('faculty', faculties),
+            ('program_type', program_types),
+        ]
+        positions = None
+        for column, values in selections:
+            if values is None:
+                continue
+            matched = self._positions_for(column, values)
+            positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+        if positions is None:
+            positions = np.arange(len(self.df))
+        positions = positions.copy()
+        positions.flags.writeable = False  # ผลใน cache ถูกใช้ร่วมกัน ห้ามแก้ไข
+        return positions
+
+    def filter_positions(self, selected_keyword, selected_universities=None, selected_faculties=None, selected_program_types=None):
+        """ตำแหน่งแถวของ df ที่ตรงกับตัวกรองประเภทหลักสูตร/มหาวิทยาลัย/คณะ (และประเภทหลักสูตรหากระบุ)"""
+        keyword = selected_keyword if selected_keyword and selected_keyword != 'all' else None
+        return self._filtered_positions(keyword, normalize_selection(selected_universities),
+                                        normalize_selection(selected_faculties), normalize_selection(selected_program_types))
+
+    def _compute_rollup(self, by, keyword, universities, faculties):
+        cells = self.aggregates
+        for column, values in (('keyword', (keyword,) if keyword is not None else None),
+                               ('university', universities), ('faculty', faculties)):
+            if values is not None:
+                cells = cells[cells[column].isin(values)]
+        # ไม่มีแถวที่มีตัวเลขค่าเทอมในกลุ่ม: count = 0 และค่าเฉลี่ยเป็น NaN
+        if by is None:
+            totals = cells.agg(CUBE_MEASURES)
+            totals['mean'] = totals['sum'] / totals['count'] if totals['count'] > 0 else np.nan
+            return totals
+        totals = cells.groupby(by, observed=True)[list(CUBE_MEASURES)].agg(CUBE_MEASURES)
+        totals.index = totals.index.astype(object)
+        totals['mean'] = totals['sum'] / totals['count'].where(totals['count'] > 0)
+        return totals
+
+    def fee_rollup(self, by, selected_keyword, selected_universities=None, selected_faculties=None):
+        """รวมค่าเทอมจาก cube ตามตัวกรอง: by=None คืน Series (sum, count, min, max, rows, mean) ของทั้งตัวกรอง
+        by='university' (หรือมิติอื่นของ cube) คืน DataFrame หนึ่งแถวต่อค่าของมิตินั้น ผลถูกใช้ร่วมกัน ห้ามแก้ไข"""
+        keyword = selected_keyword if selected_keyword and selected_keyword != 'all' else None
+        return self._rollups(by, keyword, normalize_selection(selected_universities), normalize_selection(selected_faculties))
+
+    def distinct_values(self, column, positions):
+        """ค่าที่ไม่ซ้ำ (เรียงแล้ว) ของคอลัมน์ categorical ในแถวที่กำหนด คำนวณจากรหัสโดยไม่ต้องเทียบข้อความ"""
+        codes = self.df[column].cat.codes.to_numpy()[positions]
+        return list(self.df[column].cat.categories[np.unique(codes[codes >= 0])])
+
+    def column_values(self, column, positions):
+        # เลือกแถวก่อนแปลงเป็น numpy: คอลัมน์ข้อความแบบ Arrow ทั้งคอลัมน์แปลงช้า
+        return self.df[column].take(positions).to_numpy()
+
+    def search_programs(self, positions, search_value, limit=PROGRAM_OPTION_LIMIT):
+        """ตำแหน่งแถว (ไม่เกิน limit หลักสูตร) ในแถวที่กำหนดที่ตรงกับคำค้น: แถวที่ขึ้นต้นด้วยคำค้นก่อน
+        แล้วจึงแถวที่มีคำค้นอยู่ภายใน แต่ละกลุ่มเรียงตามลำดับของตาราง"""
+        query = normalize_search_text(search_value)
+        if not query:
+            return positions[:limit]
+        allowed = np.zeros(len(self.df), dtype=bool)
+        allowed[positions] = True
+        lo, hi = np.searchsorted(self.sorted_search_keys, [query, query + '\U0010ffff'])
+        prefix = np.sort(self.search_order[lo:hi])
+        matches = list(prefix[allowed[prefix]][:limit])
+        # หาแบบ substring เฉพาะเมื่อแถวที่ขึ้นต้นด้วยคำค้นยังไม่พอ และหยุดทันทีเมื่อครบ limit
+        # (คำค้นไม่มีช่องว่างหลัง normalize จึงไม่มีทางตรงข้ามรอยต่อ '\n' ระหว่างแถว)
+        start = 0
+        while len(matches) < limit:
+            found = self.search_blob.find(query, start)
+            if found < 0:
+                break
+            row = bisect.bisect_right(self.search_offsets, found) - 1
+            start = self.search_offsets[row + 1]  # ข้ามไปแถวถัดไป
+            if allowed[row] and found != self.search_offsets[row]:
+                matches.append(row)
+        return np.array(matches, dtype=np.int64)
+
+    def program_options(self, positions, search_value=None, selected=None, limit=PROGRAM_OPTION_LIMIT):
+        """ตัวเลือกของ program-dropdown: หลักสูตรที่ตรงกับคำค้นไม่เกิน limit รายการ (ไม่ซ้ำ unique_id)
+        รวมหลักสูตรที่เลือกไว้แล้วเสมอ เพื่อไม่ให้ค่าที่เลือกหายไปจากช่องขณะพิมพ์ค้นหาต่อ"""
+        # หลักสูตรเดียวกันมีหลายแถวเมื่อพบจากหลายคำค้น จึงขอผลเผื่อไว้ก่อนตัดซ้ำ
+        matched = self.search_programs(positions, search_value, limit * 4)
+        if selected:
+            rows = self.rows_by_id.get_indexer_for(selected)
+            # positions เรียงอยู่แล้ว: ตรวจว่าแถวที่เลือกอยู่ในตัวกรองด้วย searchsorted
+            at = np.minimum(np.searchsorted(positions, rows), max(len(positions) - 1, 0))
+            rows = rows[(rows >= 0) & (positions[at] == rows)] if len(positions) else EMPTY_POSITIONS
+            matched = np.concatenate([rows, matched])
+        options, seen = [], set()
+        for label, value, key in zip(self.column_values('display_text', matched), self.column_values('unique_id', matched),
+                                     self.search_keys[matched]):
+            if value in seen:
+                continue
+            seen.add(value)
+            # dropdown กรองตัวเลือกซ้ำฝั่ง browser จาก label/value/search จึงต้องแนบรูปที่ normalize แล้ว
+            # ไม่เช่นนั้นผลที่ตรงแบบไม่สนช่องว่างจะถูกกรองทิ้ง
+            options.append({'label': label, 'value': value, 'search': key})
+            if len(options) >= limit + len(selected or []):
+                break
+        return options
+
+    def filter_combinations(self):
+        """ชุด (keyword, university, faculty) ที่มีอยู่จริงในรูปรหัส categorical พร้อมรายการค่าของแต่ละคอลัมน์
+        ส่งให้ browser ครั้งเดียวต่อรุ่นข้อมูล เพื่อคำนวณตัวเลือกมหาวิทยาลัย/คณะฝั่ง client"""
+        columns = ['keyword', 'university', 'faculty']
+        cube = self.aggregates
+        if cube.empty:
+            return {'keywords': [], 'universities': [], 'faculties': [], 'cells': []}
+        cells = pd.DataFrame({col: cube[col].cat.codes for col in columns}).drop_duplicates()
+        return {
+            'keywords': list(cube['keyword'].cat.categories),
+            'universities': list(cube['university'].cat.categories),
+            'faculties': list(cube['faculty'].cat.categories),
+            'cells': cells.to_numpy().tolist(),
+        }
+
+    def comparison_rows(self, unique_ids):
+        """แถวของหลักสูตรที่กำหนด (ทุกแถวที่มี unique_id นี้ รวมแถวจากคำค้นอื่น) ในรูป {คอลัมน์: รายการค่า}
+        ค่าที่ว่างเป็น None คอลัมน์ categorical ส่งเป็น {'values': ค่าที่ใช้, 'codes': ลำดับของค่าในแต่ละแถว}
+        ขนาดจึงขึ้นกับจำนวนหลักสูตรที่ขอ ไม่ใช่จำนวนแถวในตัวกรอง"""
+        rows = self.rows_by_id.get_indexer_for(pd.unique(pd.Series(unique_ids or [], dtype=object)))
+        frame = self.df.iloc[np.sort(rows[rows >= 0])]
+        columns = {}
+        for col in COMPARISON_COLUMNS:
+            if col not in frame:
+                continue
+            values = frame[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.cat.remove_unused_categories()
+                columns[col] = {'values': list(values.cat.categories), 'codes': values.cat.codes.tolist()}
+            else:
+                columns[col] = values.astype(object).where(values.notna(), None).tolist()
+        return columns
+
+    def keyword_options(self):
+        options = [{'label': 'ทั้งหมด', 'value': 'all'}]
+        if 'keyword' in self.filter_index:
+            options.extend({'label': kw.replace(' ', ''), 'value': kw} for kw in self.filter_index['keyword'])
+        return options
 
-df = load_data()
+    def table_rows(self, positions, filter_query=None, sort_by=None):
+        """แถวทั้งหมดของตารางหลังกรองและเรียงตามเงื่อนไขของ DataTable (ไม่แบ่งหน้า)"""
+        frame = self.df.iloc[positions, [self.df.columns.get_loc(c) for c in TABLE_COLUMNS]]
+        return apply_table_query(frame, filter_query, sort_by)
 
-if df.empty:
+    def table_page(self, positions, page_current, page_size, filter_query=None, sort_by=None):
+        """คืน (แถวของหน้าที่ร้องขอ, จำนวนหน้าทั้งหมด, หน้าปัจจุบันที่ปรับให้อยู่ในช่วง)"""
+        frame = self.table_rows(positions, filter_query, sort_by)
+        page_size = page_size or 10
+        page_count = max(1, -(-len(frame) // page_size))
+        page_current = min(max(page_current or 0, 0), page_count - 1)
+        start = page_current * page_size
+        return frame.iloc[start:start + page_size].to_dict('records'), page_count, page_current
+
+def file_signature(file_path):
+    stat = os.stat(file_path)
+    return (stat.st_mtime, stat.st_size)
+
+def load_dashboard_data(file_path):
+    # รุ่นข้อมูลมาจาก mtime ของไฟล์ต้นทาง (มิลลิวินาที) ไม่ใช่ตัวนับ ทุก worker ที่โหลดไฟล์เดียวกันจึงได้รุ่นเดียวกัน
+    # browser ที่ถูกส่งไปคนละ worker จะไม่เห็นรุ่นสลับไปมา
+    signature = file_signature(file_path) if os.path.exists(file_path) else None
+    version = int(signature[0] * 1000) if signature else 0
+    return DashboardData(load_data(file_path), source=file_path, signature=signature, version=version)
+
+data = load_dashboard_data(DATA_FILE)
+
+def current_data():
+    """ข้อมูลชุดปัจจุบัน: callback ควรเรียกครั้งเดียวแล้วใช้ object เดิมตลอดการทำงาน"""
+    return data
+
+# --- 2.1 โหลดไฟล์ผลการดึงข้อมูลใหม่อัตโนมัติ (hot reload) ---
+# thread เบื้องหลังตรวจหาไฟล์ผลการดึงข้อมูลที่ใหม่กว่าไฟล์ที่ใช้อยู่ เตรียมข้อมูลนอก request
+# แล้วสลับ `data` ทั้งก้อน (การกำหนดค่าตัวแปรเดียวเป็น atomic) cache ของชุดเก่าจึงถูกทิ้งไปพร้อมกัน
+# ดูเฉพาะไฟล์ของการดึงข้อมูลครบทุกคำค้น (mytcas_scraped_YYYYMMDD_HHMMSS.xlsx) และไฟล์ที่รวมแล้ว (mytcas_scraped_merged*.xlsx)
+# ไฟล์ของ shard (mytcas_scraped_shard1of4_...) และงานของ scrape_service (mytcas_scraped_job3_...) มีข้อมูลเพียงบางส่วน จึงไม่ถูกสลับไปใช้
+SCRAPE_FILE_PATTERN = 'mytcas_scraped_*.xlsx'
+SCRAPE_FILE_RE = re.compile(r'^mytcas_scraped_(?:\d{8}_\d{6}|merged\w*)\.xlsx$')
+WATCH_INTERVAL_SECONDS = 30
+SETTLE_SECONDS = 5  # ไฟล์ต้องไม่ถูกแก้ไขอย่างน้อยเท่านี้ก่อนอ่าน (กันอ่านไฟล์ที่ยังเขียนไม่เสร็จ)
+
+def data_file_candidates(current):
+    """ไฟล์ข้อมูลที่สลับไปใช้ได้ เรียงจากใหม่ไปเก่า (mtime): ไฟล์ที่ใช้อยู่และไฟล์ผลการดึงข้อมูลครบชุดในโฟลเดอร์เดียวกัน"""
+    folder = os.path.dirname(os.path.abspath(current.source or DATA_FILE))
+    candidates = [path for path in glob.glob(os.path.join(folder, SCRAPE_FILE_PATTERN))
+                  if SCRAPE_FILE_RE.match(os.path.basename(path))]
+    if current.source and os.path.exists(current.source) and current.source not in candidates:
+        candidates.append(current.source)
+    return sorted(candidates, key=os.path.getmtime, reverse=True)
+
+# path -> signature ของไฟล์ที่โหลดแล้วไม่มีข้อมูลใช้งานได้ เก็บเป็นสถานะของ watcher
+# แทนการแก้ `data` ที่ callback กำลังอ่านอยู่ เพื่อไม่ให้พยายามโหลดไฟล์เดิมซ้ำทุกรอบ
+_rejected_files = {}
+
+def reload_if_changed():
+    """โหลดข้อมูลใหม่หากมีไฟล์ใหม่กว่าหรือไฟล์เดิมถูกแก้ไข คืน True เมื่อสลับข้อมูล
+
+    ไล่จากไฟล์ใหม่สุดลงไปจนถึงไฟล์ที่ใช้อยู่ (ไม่ย้อนไปใช้ไฟล์ที่เก่ากว่า) ข้ามไฟล์ที่เคยถูกปฏิเสธ จึงยังสลับไปใช้ไฟล์ที่ใหม่กว่าชุดปัจจุบันได้
+    แม้ไฟล์ที่ใหม่ที่สุดจะไม่มีข้อมูลที่ใช้งานได้"""
+    global data
+    current = data
+    for path in data_file_candidates(current):
+        signature = file_signature(path)
+        if path == current.source and signature == current.signature:
+            return False
+        if _rejected_files.get(path) == signature:
+            if path == current.source:
+                return False
+            continue
+        if time.time() - signature[0] < SETTLE_SECONDS:
+            return False
+
+        new_data = load_dashboard_data(path)
+        if new_data.df.empty:
+            print(f"⚠️ ไม่สลับข้อมูล: ไฟล์ '{path}' ไม่มีข้อมูลที่ใช้งานได้")
+            _rejected_files[path] = signature
+            if path == current.source:
+                return False
+            continue
+        data = new_data
+        print(f"🔄 สลับไปใช้ข้อมูลจาก '{path}' แล้ว (รุ่น {new_data.version}, {len(new_data.df)} แถว)")
+        return True
+    return False
+
+def _watch_data_files(stop_event, interval):
+    while not stop_event.wait(interval):
+        try:
+            reload_if_changed()
+        except Exception as e:
+            print(f"❌ Error ระหว่างตรวจหาไฟล์ข้อมูลใหม่: {e}")
+
+def start_data_watcher(interval=WATCH_INTERVAL_SECONDS):
+    """เริ่ม thread ตรวจไฟล์ข้อมูลใหม่ (daemon) คืน Event สำหรับสั่งหยุด"""
+    stop_event = threading.Event()
+    threading.Thread(target=_watch_data_files, args=(stop_event, interval), name='data-watcher', daemon=True).start()
+    return stop_event
+
+# --- 3. กรอง เรียง และแบ่งหน้าตารางหลักสูตรฝั่งเซิร์ฟเวอร์ ---
+# แปลง filter_query ตามไวยากรณ์ของ DataTable (เช่น "{university} contains จุฬา && {keyword} eq ...")
+# operator ถูกอ่านจาก token ที่ตามหลัง {คอลัมน์} เท่านั้น ค่าที่มีคำว่า contains หรือเครื่องหมาย < จึงไม่ทำให้แยกผิด
+FILTER_PART_RE = re.compile(r'^\s*\{(?P<name>[^}]*)\}\s+(?P<operator>\S+)\s*(?P<value>.*?)\s*$', re.DOTALL)
+FILTER_OPERATORS = {
+    'ge': 'ge', '>=': 'ge', 'le': 'le', '<=': 'le', 'lt': 'lt', '<': 'lt', 'gt': 'gt', '>': 'gt',
+    'ne': 'ne', '!=': 'ne', 'eq': 'eq', '=': 'eq', 'contains': 'contains', 'datestartswith': 'datestartswith',
+}
+
+def split_filter_part(filter_part):
+    """แยกเงื่อนไขหนึ่งส่วนเป็น (ชื่อคอลัมน์, operator, ค่า, ไม่สนตัวพิมพ์ใหญ่เล็ก)"""
+    match = FILTER_PART_RE.match(filter_part)
+    if not match:
+        return None, None, None, False
+    token = match['operator']
+    # DataTable เติม i (ไม่สนตัวพิมพ์ใหญ่เล็ก) หรือ s (สนตัวพิมพ์) หน้า operator เช่น icontains, s=
+    ignore_case = False
+    operator = FILTER_OPERATORS.get(token)
+    if operator is None and token[:1] in ('i', 's'):
+        operator = FILTER_OPERATORS.get(token[1:])
+        ignore_case = token[0] == 'i'
+    if operator is None:
+        return None, None, None, False
+
+    value_part = match['value']
+    v0 = value_part[0] if value_part else ''
+    if v0 and len(value_part) > 1 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+        value = value_part[1:-1].replace('\\' + v0, v0)
+    else:
+        try:
+            value = float(value_part)
+        except ValueError:
+            value = value_part
+    return match['name'], operator, value, ignore_case
+
+def split_filter_query(filter_query):
+    """แยก filter_query ที่ ' && ' ซึ่งอยู่นอกเครื่องหมายคำพูด (ค่าที่อยู่ในคำพูดอาจมี && ได้)"""
+    parts, start, quote = [], 0, None
+    i = 0
+    while i < len(filter_query):
+        ch = filter_query[i]
+        if quote:
+            if ch == '\\':
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in ('"', "'", '`'):
+            quote = ch
+        elif filter_query.startswith(' && ', i):
+            parts.append(filter_query[start:i])
+            start = i + 4
+            i += 3
+        i += 1
+    parts.append(filter_query[start:])
+    return parts
+
+COMPARE_OPERATORS = {'eq': '__eq__', 'ne': '__ne__', 'lt': '__lt__', 'le': '__le__', 'gt': '__gt__', 'ge': '__ge__'}
+
+def filter_mask(column, operator, value, ignore_case=False):
+    """แถวของคอลัมน์ที่ตรงเงื่อนไขหนึ่งส่วนของ filter_query
+
+    ค่าที่ใช้เทียบถูกแปลงตามชนิดของคอลัมน์: คอลัมน์ตัวเลขเทียบเป็นตัวเลข (ค่าที่ไม่ใช่ตัวเลขไม่ตรงแถวใด)
+    คอลัมน์ข้อความเทียบเป็นข้อความ ยกเว้น < > <= >= กับค่าที่เป็นตัวเลข ซึ่งเทียบกับแถวที่อ่านเป็นตัวเลขได้
+    (ข้อความ "10" < "5" จึงไม่เกิดขึ้น) operator แบบ i เทียบด้วยตัวพิมพ์เล็กทั้งสองฝั่ง"""
+    numeric_column = pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column)
+    relational = operator in ('lt', 'le', 'gt', 'ge')
+    if operator in COMPARE_OPERATORS and (numeric_column or (relational and isinstance(value, float))):
+        if numeric_column:
+            numbers = column
+        else:
+            numbers = pd.to_numeric(column.astype(str).str.replace(',', '', regex=False), errors='coerce')
+        try:
+            number = float(value)
+        except ValueError:
+            return pd.Series(False, index=column.index)
+        return getattr(numbers.astype('float64'), COMPARE_OPERATORS[operator])(number).fillna(False).astype(bool)
+
+    text = column.astype(str).where(column.notna(), '')
+    value = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+    if ignore_case:
+        text, value = text.str.lower(), value.lower()
+    if operator == 'contains':
+        mask = text.str.contains(value, regex=False)
+    elif operator == 'datestartswith':
+        mask = text.str.startswith(value)
+    else:
+        mask = getattr(text, COMPARE_OPERATORS[operator])(value)
+        if relational:
+            mask &= column.notna()  # ช่องว่างไม่น้อยหรือมากกว่าค่าใด
+    return mask.fillna(False).astype(bool)
+
+def apply_table_query(frame, filter_query, sort_by):
+    """กรองตาม filter_query และเรียงตาม sort_by ของ DataTable"""
+    if filter_query:
+        for filter_part in split_filter_query(filter_query):
+            col_name, operator, filter_value, ignore_case = split_filter_part(filter_part)
+            if col_name not in frame.columns:
+                continue
+            frame = frame[filter_mask(frame[col_name], operator, filter_value, ignore_case)]
+
+    if sort_by:
+        frame = frame.sort_values(
+            [col['column_id'] for col in sort_by],
+            ascending=[col['direction'] == 'asc' for col in sort_by],
+            kind='stable'
+        )
+    return frame
+
+# --- 3.1 ประวัติค่าเล่าเรียนจากทุกรอบการดึงข้อมูล ---
+# อ่านจาก HistoryStore (SQLite) ที่ scraper เพิ่มข้อมูลทุกรอบ เปิดแบบอ่านอย่างเดียวต่อ callback
+# เพื่อไม่ใช้ connection ร่วมกันข้าม thread ของเซิร์ฟเวอร์
+HISTORY_FILE = 'mytcas_history.sqlite3'
+MONTHLY_AFTER_DAYS = 366  # ช่วงข้อมูลยาวกว่านี้แสดงแนวโน้มรายเดือนแทนรายวัน
+
+def open_history():
+    if not os.path.exists(HISTORY_FILE):
+        return None
+    try:
+        return HistoryStore(HISTORY_FILE, readonly=True)
+    except Exception as e:
+        print(f"⚠️ เปิดไฟล์ประวัติ '{HISTORY_FILE}' ไม่สำเร็จ: {e}")
+        return None
+
+def trend_period_length(history):
+    """10 = รายวัน, 7 = รายเดือน ตามความยาวของช่วงข้อมูลที่มี"""
+    first, last = history.time_range()
+    if not first or not last:
+        return 10
+    span = pd.Timestamp(last) - pd.Timestamp(first)
+    return 7 if span.days > MONTHLY_AFTER_DAYS else 10
+
+# เวลาต่อ callback แยกตามขั้นตอน (filter/aggregate/figure/serialize) และขนาด response
+# ดูได้ที่ /diagnostics หรือ /metrics (JSON, ?format=prometheus) ของแต่ละ worker
+metrics = CallbackMetrics()
+
+# บีบอัด (gzip/br) response ของ callback เช่น JSON ของตารางและกราฟ เมื่อติดตั้ง flask-compress
+COMPRESS_RESPONSES = importlib.util.find_spec('flask_compress') is not None
+
+if data.df.empty:
     print("ไม่สามารถสร้าง Dashboard ได้เนื่องจากไม่มีข้อมูลที่ใช้งานได้. โปรดตรวจสอบไฟล์ mytcas_scrape.xlsx และโครงสร้างข้อมูล.")
     app = dash.Dash(__name__)
     app.layout = html.Div([
@@ -61,6 +598,7 @@ if df.empty:
     ], style={'backgroundColor': '#F8F8F8', 'minHeight': '100vh', 'padding': '20px'})
 else:
     app = dash.Dash(__name__, 
+                    compress=COMPRESS_RESPONSES,
                     external_stylesheets=['https://fonts.googleapis.com/css2?family=Kanit:wght@300;400;600&display=swap'],
                     meta_tags=[{'name': 'viewport', 'content': 'width=device-width, initial-scale=1.0'}])
 
@@ -71,6 +609,19 @@ else:
         'minHeight': '100vh',
         'color': '#333333'
     }, children=[
+        # ตรวจรุ่นข้อมูลเป็นระยะ เมื่อ watcher สลับข้อมูลใหม่ callback ทั้งหมดจะคำนวณใหม่จาก 'data-version'
+        dcc.Interval(id='data-refresh-interval', interval=WATCH_INTERVAL_SECONDS * 1000),
+        dcc.Store(id='data-version', data=data.version),
+        # ข้อมูลที่ clientside callback ใช้: ชุดค่าตัวกรองที่มีอยู่จริง, แถวของหลักสูตรในตัวเลือกของ program-dropdown,
+        # สรุปค่าเทอมของตัวกรอง และรูปแบบกราฟเปรียบเทียบ
+        dcc.Store(id='filter-index', data=data.filter_combinations()),
+        dcc.Store(id='comparison-rows'),
+        dcc.Store(id='filter-totals'),
+        dcc.Store(id='comparison-chart-style', data={
+            'template': px.bar().layout.template.to_plotly_json(),
+            'colors': px.colors.sequential.Blues_r,
+        }),
+
         html.H1("ภาพรวมหลักสูตร MyTCAS 🎓", style={
             'textAlign': 'center',
             'color': '#001F54',
@@ -86,11 +637,7 @@ else:
                 html.P("เลือกประเภทหลักสูตร:", style={'color': '#555555', 'marginBottom': '5px'}),
                 dcc.Dropdown(
                     id='keyword-filter-dropdown',
-                    options=[
-                        {'label': 'ทั้งหมด', 'value': 'all'},
-                        {'label': 'วิศวกรรมคอมพิวเตอร์', 'value': 'วิศวกรรม คอมพิวเตอร์'},
-                        {'label': 'วิศวกรรมปัญญาประดิษฐ์', 'value': 'วิศวกรรม ปัญญาประดิษฐ์'}
-                    ],
+                    options=data.keyword_options(),
                     value='all',
                     clearable=False,
                     style={'backgroundColor': '#FFFFFF', 'borderColor': '#B0C4DE', 'borderRadius': '5px', 'padding': '5px', 'marginBottom': '15px'}
@@ -121,6 +668,7 @@ else:
                     id='program-dropdown',
                     options=[],
                     multi=True,
+                    search_order='original',  # คงลำดับผลค้นหาจากเซิร์ฟเวอร์ (ขึ้นต้นด้วยคำค้นก่อน)
                     placeholder="ค้นหาและเลือกหลักสูตร...",
                     style={
                         'backgroundColor': '#FFFFFF', 
@@ -194,6 +742,26 @@ else:
 
         html.Hr(style={'borderColor': '#B0C4DE', 'borderWidth': '1px', 'borderStyle': 'solid', 'margin': '40px 0'}),
 
+        html.H2("แนวโน้มค่าเทอมตามช่วงเวลา 📉", style={
+            'textAlign': 'center',
+            'color': '#001F54',
+            'marginBottom': '25px',
+            'fontSize': '2.2em'
+        }),
+
+        html.Div([
+            dcc.Graph(id='fee-history-chart', config={'displayModeBar': False})
+        ], style={
+            'padding': '25px', 
+            'backgroundColor': '#FFFFFF', 
+            'borderRadius': '10px', 
+            'boxShadow': '0 4px 12px rgba(0, 0, 0, 0.1)',
+            'border': '1px solid #E0E0E0',
+            'marginBottom': '40px'
+        }),
+
+        html.Hr(style={'borderColor': '#B0C4DE', 'borderWidth': '1px', 'borderStyle': 'solid', 'margin': '40px 0'}),
+
         html.H2("รายละเอียดหลักสูตรทั้งหมด 📋", style={
             'textAlign': 'center',
             'color': '#001F54',
@@ -201,7 +769,59 @@ else:
             'fontSize': '2.2em'
         }),
 
-        html.Div(id='all-programs-table', style={
+        html.Div(id='all-programs-table', children=[
+            # ส่งออกทุกแถวตามตัวกรองและเงื่อนไขของตาราง (สร้างไฟล์ฝั่งเซิร์ฟเวอร์ ไม่ใช่เฉพาะหน้าที่แสดง)
+            html.Button("ส่งออก Excel ⬇️", id='export-table-button', n_clicks=0, style={
+                'backgroundColor': '#034078',
+                'color': 'white',
+                'border': 'none',
+                'borderRadius': '5px',
+                'padding': '8px 16px',
+                'marginBottom': '15px',
+                'fontFamily': "'Kanit', sans-serif",
+                'cursor': 'pointer'
+            }),
+            dcc.Download(id='table-download'),
+            dash_table.DataTable(
+                id='table-container',
+                columns=[{"name": TABLE_HEADERS[c], "id": c, "type": "text"} for c in TABLE_COLUMNS],
+                data=[],
+                # กรอง เรียง และแบ่งหน้าที่ฝั่งเซิร์ฟเวอร์ (ดู update_table) ส่งไปเบราว์เซอร์เฉพาะแถวของหน้าที่แสดง
+                page_action="custom",
+                filter_action="custom",
+                sort_action="custom",
+                sort_mode="single",
+                page_current=0,
+                page_size=10,
+                page_count=1,
+                style_header={
+                    'backgroundColor': '#034078',
+                    'color': 'white',
+                    'fontWeight': 'bold',
+                    'textAlign': 'left',
+                    'fontFamily': "'Kanit', sans-serif"
+                },
+                style_data={
+                    'backgroundColor': 'white',
+                    'color': '#333333',
+                    'fontFamily': "'Kanit', sans-serif"
+                },
+                style_cell={
+                    'padding': '10px',
+                    'border': '1px solid #E0E0E0',
+                    'whiteSpace': 'normal',
+                    'height': 'auto',
+                    'minWidth': '100px', 'width': '150px', 'maxWidth': '300px',
+                    'textAlign': 'left'
+                },
+                style_data_conditional=[
+                    {
+                        'if': {'row_index': 'odd'},
+                        'backgroundColor': '#F8F8F8'
+                    }
+                ]
+            )
+        ], style={
             'padding': '25px', 
             'backgroundColor': '#FFFFFF', 
             'borderRadius': '10px', 
@@ -211,255 +831,389 @@ else:
     ])
 
     # --- 4. สร้าง Callbacks สำหรับการโต้ตอบ ---
+    # ทุก callback เรียก current_data() ครั้งเดียว จึงใช้ข้อมูลชุดเดียวกันตลอดแม้ watcher จะสลับข้อมูลระหว่างทำงาน
 
     @app.callback(
+        [Output('data-version', 'data'),
+         Output('keyword-filter-dropdown', 'options'),
+         Output('filter-index', 'data')],
+        [Input('data-refresh-interval', 'n_intervals')],
+        [State('data-version', 'data')]
+    )
+    @metrics.track
+    def refresh_data_version(n_intervals, known_version):
+        d = current_data()
+        if d.version == known_version:
+            raise PreventUpdate
+        return d.version, d.keyword_options(), d.filter_combinations()
+
+    # ตัวเลือกและค่าของตัวกรองมหาวิทยาลัย/คณะคำนวณใน browser จาก 'filter-index' (ชุดค่าที่มีอยู่จริง)
+    # กฎเดียวกับที่เคยทำบนเซิร์ฟเวอร์: เลือก 'ทั้งหมด' ร่วมกับค่าอื่น หรือค่าที่ไม่อยู่ในตัวเลือกแล้ว จะกลับเป็น ['all']
+    app.clientside_callback(
+        """
+        function(keyword, universities, faculties, index, programs) {
+            if (!index) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const ALL = {label: 'ทั้งหมด', value: 'all'};
+            const kw = keyword && keyword !== 'all' ? index.keywords.indexOf(keyword) : null;
+            const cells = index.cells.filter(c => kw === null || c[0] === kw);
+
+            function valuesOf(rows, column, names) {
+                const codes = Array.from(new Set(rows.map(c => c[column]))).sort((a, b) => a - b);
+                return codes.map(code => names[code]);
+            }
+            function normalize(selected, available) {
+                if (!selected || !selected.length || selected.includes('all')) {
+                    return ['all'];
+                }
+                const valid = selected.filter(v => available.includes(v));
+                return valid.length ? valid : ['all'];
+            }
+
+            const uniValues = valuesOf(cells, 1, index.universities);
+            const uniValue = normalize(universities, uniValues);
+            const uniCells = uniValue[0] === 'all' ? cells
+                : cells.filter(c => uniValue.includes(index.universities[c[1]]));
+            const facValues = valuesOf(uniCells, 2, index.faculties);
+            const facValue = normalize(faculties, facValues);
+
+            return [
+                [ALL].concat(uniValues.map(v => ({label: v, value: v}))), uniValue,
+                [ALL].concat(facValues.map(v => ({label: v, value: v}))), facValue,
+                // ล้างหลักสูตรที่เลือกเฉพาะเมื่อมีค่าอยู่ ไม่เช่นนั้นกราฟประวัติจะถูกเรียกซ้ำโดยไม่จำเป็น
+                programs && programs.length ? [] : window.dash_clientside.no_update,
+            ];
+        }
+        """,
         [Output('university-filter-dropdown', 'options'),
          Output('university-filter-dropdown', 'value'),
          Output('faculty-filter-dropdown', 'options'),
          Output('faculty-filter-dropdown', 'value'),
-         Output('program-dropdown', 'options'),
          Output('program-dropdown', 'value')],
         [Input('keyword-filter-dropdown', 'value'),
          Input('university-filter-dropdown', 'value'),
-         Input('faculty-filter-dropdown', 'value')]
+         Input('faculty-filter-dropdown', 'value'),
+         Input('filter-index', 'data')],
+        [State('program-dropdown', 'value')]
     )
-    def update_filter_options(selected_keyword, selected_universities_current, selected_faculties_current):
-        current_filtered_df = df.copy()
-
-        if selected_keyword and selected_keyword != 'all':
-            current_filtered_df = current_filtered_df[current_filtered_df['keyword'] == selected_keyword]
-        
-        university_options = [{'label': 'ทั้งหมด', 'value': 'all'}]
-        university_options.extend([{'label': uni, 'value': uni} for uni in sorted(current_filtered_df['university'].unique())])
-
-        new_uni_value = ['all']
-        if selected_universities_current:
-            if 'all' in selected_universities_current and len(selected_universities_current) > 1:
-                new_uni_value = ['all']
-            elif 'all' not in selected_universities_current:
-                valid_selected_unis = [uni for uni in selected_universities_current if uni in [opt['value'] for opt in university_options]]
-                if valid_selected_unis:
-                    new_uni_value = valid_selected_unis
-                else:
-                    new_uni_value = ['all']
-        
-        if new_uni_value and 'all' not in new_uni_value:
-             current_filtered_df = current_filtered_df[current_filtered_df['university'].isin(new_uni_value)]
-
-        faculty_options = [{'label': 'ทั้งหมด', 'value': 'all'}]
-        faculty_options.extend([{'label': fac, 'value': fac} for fac in sorted(current_filtered_df['faculty'].unique())])
-        
-        new_fac_value = ['all']
-        if selected_faculties_current:
-            if 'all' in selected_faculties_current and len(selected_faculties_current) > 1:
-                new_fac_value = ['all']
-            elif 'all' not in selected_faculties_current:
-                valid_selected_facs = [fac for fac in selected_faculties_current if fac in [opt['value'] for opt in faculty_options]]
-                if valid_selected_facs:
-                    new_fac_value = valid_selected_facs
-                else:
-                    new_fac_value = ['all']
-
-        if new_fac_value and 'all' not in new_fac_value:
-            current_filtered_df = current_filtered_df[current_filtered_df['faculty'].isin(new_fac_value)]
 
-        # *** การเปลี่ยนแปลงที่นี่: ใช้ 'display_text' สำหรับ label และ 'unique_id' สำหรับ value ***
-        program_options = [{'label': row['display_text'], 'value': row['unique_id']} for index, row in current_filtered_df.iterrows()]
-        
-        return university_options, new_uni_value, faculty_options, new_fac_value, program_options, [] 
+    # ตัวเลือกหลักสูตรค้นหาฝั่งเซิร์ฟเวอร์ทุกครั้งที่พิมพ์ ส่งกลับเฉพาะ PROGRAM_OPTION_LIMIT รายการแรกที่ตรง
+    # แทนการส่งทุกหลักสูตรในตัวกรองไปให้ browser พร้อมแถวของหลักสูตรในตัวเลือก (ซึ่งรวมหลักสูตรที่เลือกไว้เสมอ)
+    # สำหรับกราฟเปรียบเทียบ การเลือกหลักสูตรจึงวาดกราฟใน browser ได้ทันทีโดยไม่ต้องเรียกเซิร์ฟเวอร์
+    @app.callback(
+        [Output('program-dropdown', 'options'),
+         Output('comparison-rows', 'data')],
+        [Input('program-dropdown', 'search_value'),
+         Input('keyword-filter-dropdown', 'value'),
+         Input('university-filter-dropdown', 'value'),
+         Input('faculty-filter-dropdown', 'value'),
+         Input('data-version', 'data')],
+        [State('program-dropdown', 'value')]
+    )
+    @metrics.track
+    def update_program_options(search_value, selected_keyword, selected_universities, selected_faculties, data_version, selected_programs):
+        d = current_data()
+        with metrics.phase('filter'):
+            positions = d.filter_positions(selected_keyword, selected_universities, selected_faculties)
+        with metrics.phase('search'):
+            options = d.program_options(positions, search_value, selected_programs)
+        with metrics.phase('rows'):
+            return options, d.comparison_rows([option['value'] for option in options])
 
+    # กราฟภาพรวม และสรุปค่าเทอมของตัวกรองสำหรับข้อความเมื่อยังไม่เลือกหลักสูตร (ส่งใน request เดียวกัน)
     @app.callback(
-        Output('overview-tuition-chart', 'figure'),
+        [Output('overview-tuition-chart', 'figure'),
+         Output('filter-totals', 'data')],
         [Input('keyword-filter-dropdown', 'value'),
          Input('university-filter-dropdown', 'value'),
-         Input('faculty-filter-dropdown', 'value')]
+         Input('faculty-filter-dropdown', 'value'),
+         Input('data-version', 'data')]
     )
-    def update_overview_chart(selected_keyword, selected_universities, selected_faculties):
-        filtered_df_for_overview = df.copy()
-
-        if selected_keyword and selected_keyword != 'all':
-            filtered_df_for_overview = filtered_df_for_overview[filtered_df_for_overview['keyword'] == selected_keyword]
-        
-        if selected_universities and 'all' not in selected_universities:
-            filtered_df_for_overview = filtered_df_for_overview[filtered_df_for_overview['university'].isin(selected_universities)]
-
-        if selected_faculties and 'all' not in selected_faculties:
-            filtered_df_for_overview = filtered_df_for_overview[filtered_df_for_overview['faculty'].isin(selected_faculties)]
-        
-        if filtered_df_for_overview.empty:
+    @metrics.track
+    def update_overview_chart(selected_keyword, selected_universities, selected_faculties, data_version):
+        d = current_data()
+        with metrics.phase('aggregate'):
+            by_university = d.fee_rollup('university', selected_keyword, selected_universities, selected_faculties)
+            totals = d.fee_rollup(None, selected_keyword, selected_universities, selected_faculties)
+        summary = {
+            'rows': int(totals['rows']),
+            'count': int(totals['count']),
+            **{key: float(totals[key]) if totals['count'] > 0 else None for key in ('mean', 'min', 'max')},
+        }
+
+        if by_university['rows'].sum() == 0:
             fig_overview = px.bar()
             fig_overview.update_layout(
                 title='<span style="color:#001F54;"><b>ไม่พบข้อมูลสำหรับภาพรวม</b></span>',
                 plot_bgcolor='#F8F8F8', paper_bgcolor='#FFFFFF',
                 font=dict(color='#333333', family="'Kanit', sans-serif")
             )
-            return fig_overview
-
-        avg_tuition_by_uni = filtered_df_for_overview.groupby('university')['tuition_fee_numeric'].mean().reset_index()
-        avg_tuition_by_uni = avg_tuition_by_uni.sort_values(by='tuition_fee_numeric', ascending=False)
-
-        fig_overview = px.bar(
-            avg_tuition_by_uni,
-            x='university',
-            y='tuition_fee_numeric',
-            title='<span style="color:#001F54;"><b>ค่าเทอมเฉลี่ยตามมหาวิทยาลัย</b></span>',
-            labels={
-                'university': 'มหาวิทยาลัย',
-                'tuition_fee_numeric': 'ค่าเทอมเฉลี่ย (บาท/ปี)'
-            },
-            color='university',
-            color_discrete_sequence=px.colors.qualitative.Pastel
-        )
-        fig_overview.update_layout(
-            xaxis_title='มหาวิทยาลัย',
-            yaxis_title='ค่าเทอมเฉลี่ย (บาท/ปี)',
+            return fig_overview, summary
+
+        with metrics.phase('aggregate'):
+            avg_tuition_by_uni = by_university['mean'].rename('tuition_fee_numeric').dropna().reset_index()
+            avg_tuition_by_uni = avg_tuition_by_uni.sort_values(by='tuition_fee_numeric', ascending=False)
+
+        with metrics.phase('figure'):
+            fig_overview = px.bar(
+                avg_tuition_by_uni,
+                x='university',
+                y='tuition_fee_numeric',
+                title='<span style="color:#001F54;"><b>ค่าเทอมเฉลี่ยตามมหาวิทยาลัย</b></span>',
+                labels={
+                    'university': 'มหาวิทยาลัย',
+                    'tuition_fee_numeric': 'ค่าเทอมเฉลี่ย (บาท/ปี)'
+                },
+                color='university',
+                color_discrete_sequence=px.colors.qualitative.Pastel
+            )
+            fig_overview.update_layout(
+                xaxis_title='มหาวิทยาลัย',
+                yaxis_title='ค่าเทอมเฉลี่ย (บาท/ปี)',
+                plot_bgcolor='#F8F8F8',
+                paper_bgcolor='#FFFFFF',
+                font=dict(color='#333333', family="'Kanit', sans-serif"),
+                title_font=dict(color='#001F54', size=20),
+                margin=dict(l=40, r=40, t=80, b=40)
+            )
+        return fig_overview, summary
+
+    # กราฟเปรียบเทียบและสรุปหลักสูตรที่เลือกสร้างใน browser จากแถวใน 'comparison-rows' (หลักสูตรในตัวเลือก)
+    # และ 'filter-totals' เมื่อยังไม่เลือกหลักสูตร เซิร์ฟเวอร์จึงไม่ต้องสร้าง figure ของกราฟนี้
+    app.clientside_callback(
+        """
+        function(selectedIds, rows, totals, style) {
+            if (!rows || !totals || !style) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const P = children => ({namespace: 'dash_html_components', type: 'P', props: {children: children}});
+            const Div = children => ({namespace: 'dash_html_components', type: 'Div', props: {children: children}});
+            const Span = children => ({namespace: 'dash_html_components', type: 'Span', props: {children: children}});
+            const B = children => ({namespace: 'dash_html_components', type: 'B', props: {children: children}});
+            const money = v => v.toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+            const titled = text => ({
+                data: [],
+                layout: {
+                    template: style.template,
+                    title: {text: '<span style="color:#001F54;"><b>' + text + '</b></span>'},
+                    plot_bgcolor: '#F8F8F8', paper_bgcolor: '#FFFFFF'
+                }
+            });
+
+            if (!selectedIds || !selectedIds.length) {
+                const summary = [
+                    P('โปรดเลือกหลักสูตรอย่างน้อยหนึ่งรายการจาก Dropdown ด้านบนเพื่อเปรียบเทียบค่าเทอม'),
+                    P('📊 หลักสูตรในตัวกรองปัจจุบัน: ' + totals.rows + ' หลักสูตร'),
+                ];
+                if (totals.count > 0) {
+                    summary.push(P('💰 ค่าเทอมเฉลี่ย: ' + money(totals.mean) + ' บาท/ปี (ต่ำสุด ' + money(totals.min)
+                                   + ' - สูงสุด ' + money(totals.max) + ' บาท/ปี)'));
+                }
+                return [titled('เลือกหลักสูตรเพื่อเปรียบเทียบค่าเทอม'), Div(summary)];
+            }
+
+            // คอลัมน์ categorical มาเป็น {values, codes}: แปลงกลับเป็นรายการค่าต่อแถว
+            const column = name => Array.isArray(rows[name]) ? rows[name]
+                : rows[name].codes.map(code => code < 0 ? null : rows[name].values[code]);
+            rows = Object.assign({}, rows, {
+                university: column('university'), faculty: column('faculty'), program_type: column('program_type')
+            });
+            const wanted = new Set(selectedIds);
+            const picked = [];
+            rows.program_name.forEach((name, i) => {
+                // unique_id แบบเดียวกับ prepare_data
+                if (wanted.has(name + ' - ' + rows.university[i] + ' (' + rows.faculty[i] + ')')) {
+                    picked.push(i);
+                }
+            });
+            if (!picked.length) {
+                return [titled('ไม่พบข้อมูลสำหรับหลักสูตรที่เลือก'),
+                        P('ไม่พบข้อมูลหลักสูตรที่ตรงกับที่คุณเลือก. โปรดลองใหม่อีกครั้ง.')];
+            }
+
+            // หนึ่ง trace ต่อมหาวิทยาลัยตามลำดับที่พบ เหมือน px.bar(color='university', barmode='group')
+            const traces = new Map();
+            picked.forEach(i => {
+                const uni = rows.university[i];
+                if (!traces.has(uni)) {
+                    traces.set(uni, {
+                        type: 'bar', name: uni, legendgroup: uni, offsetgroup: uni, alignmentgroup: 'True',
+                        orientation: 'v', showlegend: true, textposition: 'auto',
+                        marker: {color: style.colors[traces.size % style.colors.length]},
+                        hovertemplate: 'มหาวิทยาลัย=' + uni + '<br>ชื่อหลักสูตร=%{x}<br>ค่าเทอม (บาท/ปี)=%{y:.2f}'
+                            + '<br>tuition_fee=%{customdata[0]}<br>program_type=%{customdata[1]}'
+                            + '<br>faculty=%{customdata[2]}<br>หน่วยในข้อมูลต้นทาง=%{customdata[3]}<extra></extra>',
+                        x: [], y: [], customdata: []
+                    });
+                }
+                const trace = traces.get(uni);
+                trace.x.push(rows.program_name[i]);
+                trace.y.push(rows.tuition_fee_numeric[i]);
+                trace.customdata.push([rows.tuition_fee[i], rows.program_type[i], rows.faculty[i], rows.tuition_fee_unit[i]]);
+            });
+            const figure = {
+                data: Array.from(traces.values()),
+                layout: {
+                    template: style.template,
+                    title: {text: '<span style="color:#001F54;"><b>เปรียบเทียบค่าเทอมหลักสูตรที่เลือก</b></span>',
+                            font: {color: '#001F54', size: 20}},
+                    barmode: 'group',
+                    legend: {title: {text: 'มหาวิทยาลัย'}, tracegroupgap: 0},
+                    xaxis: {categoryorder: 'total ascending', title: {text: 'หลักสูตร'}},
+                    yaxis: {title: {text: 'ค่าเทอม (บาท/ปี)'}},
+                    plot_bgcolor: '#F8F8F8',
+                    paper_bgcolor: '#FFFFFF',
+                    font: {color: '#333333', family: "'Kanit', sans-serif"},
+                    margin: {l: 40, r: 40, t: 80, b: 40}
+                }
+            };
+
+            const priced = picked.filter(i => rows.tuition_fee_numeric[i] !== null);
+            if (!priced.length) {
+                return [figure, Div([
+                    P('✨ จำนวนหลักสูตรที่เลือก: ' + picked.length + ' หลักสูตร'),
+                    P('ℹ️ หลักสูตรที่เลือกมีเพียงลิงก์รายละเอียดค่าเทอม ไม่มีตัวเลขให้เปรียบเทียบ'),
+                ])];
+            }
+            let lo = priced[0], hi = priced[0], total = 0;
+            priced.forEach(i => {
+                const fee = rows.tuition_fee_numeric[i];
+                total += fee;
+                if (fee < rows.tuition_fee_numeric[lo]) { lo = i; }
+                if (fee > rows.tuition_fee_numeric[hi]) { hi = i; }
+            });
+            const describe = i => B(rows.program_name[i] + ' (' + rows.university[i] + ')');
+            return [figure, Div([
+                P('✨ จำนวนหลักสูตรที่เลือก: ' + picked.length + ' หลักสูตร'),
+                P('💰 ค่าเทอมเฉลี่ย: ' + money(total / priced.length) + ' บาท/ปี'),
+                P([Span('⬇️ ค่าเทอมต่ำสุด: '), describe(lo), ' - ' + rows.tuition_fee[lo]]),
+                P([Span('⬆️ ค่าเทอมสูงสุด: '), describe(hi), ' - ' + rows.tuition_fee[hi]]),
+            ])];
+        }
+        """,
+        [Output('tuition-fee-comparison-chart', 'figure'),
+         Output('summary-output', 'children')],
+        [Input('program-dropdown', 'value'),
+         Input('comparison-rows', 'data'),
+         Input('filter-totals', 'data'),
+         Input('comparison-chart-style', 'data')]
+    )
+
+    @app.callback(
+        Output('fee-history-chart', 'figure'),
+        [Input('program-dropdown', 'value'),
+         Input('keyword-filter-dropdown', 'value'),
+         Input('university-filter-dropdown', 'value'),
+         Input('faculty-filter-dropdown', 'value'),
+         Input('data-version', 'data')]
+    )
+    @metrics.track
+    def update_history_chart(selected_programs_unique_ids, selected_keyword, selected_universities, selected_faculties, data_version):
+        # เลือกหลักสูตร: แสดงค่าเทอมของแต่ละหลักสูตรตามรอบการดึง / ไม่เลือก: ค่าเฉลี่ยรายมหาวิทยาลัยในตัวกรองปัจจุบัน
+        d = current_data()
+        history = open_history()
+        fig = None
+        if history is not None:
+            try:
+                if selected_programs_unique_ids:
+                    selected = d.df[d.df['unique_id'].isin(selected_programs_unique_ids)]
+                    with metrics.phase('history'):
+                        rows = pd.DataFrame(history.program_history(selected['url'].dropna().unique()))
+                    if not rows.empty:
+                        rows['program'] = rows['program_name'] + " (" + rows['university'] + ")"
+                        fig = px.line(
+                            rows, x='scrape_time', y='tuition_fee_per_year', color='program',
+                            line_shape='hv', markers=True,
+                            title='<span style="color:#001F54;"><b>ค่าเทอมของหลักสูตรที่เลือกในแต่ละรอบการดึงข้อมูล</b></span>',
+                            labels={'scrape_time': 'วันที่ดึงข้อมูล', 'tuition_fee_per_year': 'ค่าเทอม (บาท/ปี)', 'program': 'หลักสูตร'},
+                            hover_data={'tuition_fee': True}
+                        )
+                else:
+                    with metrics.phase('filter'):
+                        positions = d.filter_positions(selected_keyword, selected_universities, selected_faculties)
+                        universities = d.distinct_values('university', positions)
+                    with metrics.phase('history'):
+                        rows = pd.DataFrame(history.university_trend(universities, period_length=trend_period_length(history)))
+                    if not rows.empty:
+                        fig = px.line(
+                            rows, x='period', y='avg_fee', color='university', markers=True,
+                            title='<span style="color:#001F54;"><b>ค่าเทอมเฉลี่ยตามมหาวิทยาลัยในแต่ละช่วงเวลา</b></span>',
+                            labels={'period': 'ช่วงเวลา', 'avg_fee': 'ค่าเทอมเฉลี่ย (บาท/ปี)', 'university': 'มหาวิทยาลัย', 'programs': 'จำนวนหลักสูตร'},
+                            hover_data={'programs': True},
+                            color_discrete_sequence=px.colors.qualitative.Pastel
+                        )
+            finally:
+                history.close()
+
+        if fig is None:
+            fig = px.bar()
+            fig.update_layout(title='<span style="color:#001F54;"><b>ยังไม่มีประวัติค่าเทอมสำหรับข้อมูลที่เลือก</b></span>')
+        fig.update_layout(
             plot_bgcolor='#F8F8F8',
             paper_bgcolor='#FFFFFF',
             font=dict(color='#333333', family="'Kanit', sans-serif"),
             title_font=dict(color='#001F54', size=20),
             margin=dict(l=40, r=40, t=80, b=40)
         )
-        return fig_overview
+        return fig
 
     @app.callback(
-        [Output('tuition-fee-comparison-chart', 'figure'),
-         Output('summary-output', 'children'),
-         Output('all-programs-table', 'children')],
-        [Input('program-dropdown', 'value'),
+        [Output('table-container', 'data'),
+         Output('table-container', 'page_count'),
+         Output('table-container', 'page_current')],
+        [Input('table-container', 'page_current'),
+         Input('table-container', 'page_size'),
+         Input('table-container', 'sort_by'),
+         Input('table-container', 'filter_query'),
          Input('keyword-filter-dropdown', 'value'),
          Input('university-filter-dropdown', 'value'),
-         Input('faculty-filter-dropdown', 'value')]
+         Input('faculty-filter-dropdown', 'value'),
+         Input('data-version', 'data')]
     )
-    def update_dashboard(selected_programs_unique_ids, selected_keyword, selected_universities, selected_faculties):
-        display_df = df.copy()
-
-        if selected_keyword and selected_keyword != 'all':
-            display_df = display_df[display_df['keyword'] == selected_keyword]
-        
-        if selected_universities and 'all' not in selected_universities:
-            display_df = display_df[display_df['university'].isin(selected_universities)]
-
-        if selected_faculties and 'all' not in selected_faculties:
-            display_df = display_df[display_df['faculty'].isin(selected_faculties)]
-
-        comparison_df = pd.DataFrame()
-        summary_text = html.P("โปรดเลือกหลักสูตรอย่างน้อยหนึ่งรายการจาก Dropdown ด้านบนเพื่อเปรียบเทียบค่าเทอม")
-        
-        if selected_programs_unique_ids:
-            comparison_df = df[df['unique_id'].isin(selected_programs_unique_ids)].copy() 
-            
-            if not comparison_df.empty:
-                fig = px.bar(
-                    comparison_df,
-                    x='program_name',
-                    y='tuition_fee_numeric',
-                    color='university',
-                    barmode='group',
-                    title='<span style="color:#001F54;"><b>เปรียบเทียบค่าเทอมหลักสูตรที่เลือก</b></span>',
-                    labels={
-                        'program_name': 'ชื่อหลักสูตร',
-                        'tuition_fee_numeric': 'ค่าเทอม (บาท/ปี)',
-                        'university': 'มหาวิทยาลัย'
-                    },
-                    hover_data={
-                        'tuition_fee': True, 
-                        'program_type': True, 
-                        'faculty': True,
-                        'tuition_fee_numeric': ':.2f'
-                    },
-                    color_discrete_sequence=px.colors.sequential.Blues_r
-                )
-                fig.update_layout(
-                    xaxis={'categoryorder':'total ascending'},
-                    yaxis_title='ค่าเทอม (บาท/ปี)',
-                    xaxis_title='หลักสูตร',
-                    plot_bgcolor='#F8F8F8',
-                    paper_bgcolor='#FFFFFF',
-                    font=dict(color='#333333', family="'Kanit', sans-serif"),
-                    title_font=dict(color='#001F54', size=20),
-                    margin=dict(l=40, r=40, t=80, b=40)
-                )
-                
-                min_fee_program = comparison_df.loc[comparison_df['tuition_fee_numeric'].idxmin()]
-                max_fee_program = comparison_df.loc[comparison_df['tuition_fee_numeric'].idxmax()]
-                avg_fee = comparison_df['tuition_fee_numeric'].mean()
-
-                summary_text = html.Div([
-                    html.P(f"✨ จำนวนหลักสูตรที่เลือก: {len(comparison_df)} หลักสูตร"),
-                    html.P(f"💰 ค่าเทอมเฉลี่ย: {avg_fee:,.2f} บาท/ปี"),
-                    html.P([
-                        html.Span("⬇️ ค่าเทอมต่ำสุด: "),
-                        html.B(f"{min_fee_program['program_name']} ({min_fee_program['university']})"),
-                        f" - {min_fee_program['tuition_fee']}"
-                    ]),
-                    html.P([
-                        html.Span("⬆️ ค่าเทอมสูงสุด: "),
-                        html.B(f"{max_fee_program['program_name']} ({max_fee_program['university']})"),
-                        f" - {max_fee_program['tuition_fee']}"
-                    ]),
-                ])
-            else:
-                fig = px.bar()
-                fig.update_layout(
-                    title='<span style="color:#001F54;"><b>ไม่พบข้อมูลสำหรับหลักสูตรที่เลือก</b></span>',
-                    plot_bgcolor='#F8F8F8', paper_bgcolor='#FFFFFF'
-                )
-                summary_text = html.P("ไม่พบข้อมูลหลักสูตรที่ตรงกับที่คุณเลือก. โปรดลองใหม่อีกครั้ง.")
-        else:
-            fig = px.bar()
-            fig.update_layout(
-                title='<span style="color:#001F54;"><b>เลือกหลักสูตรเพื่อเปรียบเทียบค่าเทอม</b></span>',
-                plot_bgcolor='#F8F8F8', paper_bgcolor='#FFFFFF'
-            )
+    @metrics.track
+    def update_table(page_current, page_size, sort_by, filter_query, selected_keyword, selected_universities, selected_faculties, data_version):
+        # กลับไปหน้าแรกเมื่อสิ่งที่เปลี่ยนไม่ใช่การเปลี่ยนหน้า (ตัวกรอง การเรียง หรือเงื่อนไขในตาราง)
+        triggered = [t['prop_id'] for t in dash.callback_context.triggered]
+        if 'table-container.page_current' not in triggered:
+            page_current = 0
 
-        all_programs_table = dash_table.DataTable(
-            id='table-container',
-            columns=[
-                {"name": "ชื่อหลักสูตร", "id": "program_name", "type": "text"},
-                {"name": "มหาวิทยาลัย", "id": "university", "type": "text"},
-                {"name": "คณะ", "id": "faculty", "type": "text"},
-                {"name": "ประเภทหลักสูตร", "id": "program_type", "type": "text"},
-                {"name": "ค่าใช้จ่าย", "id": "tuition_fee", "type": "text"},
-                {"name": "คำค้นหลัก", "id": "keyword", "type": "text"}
-            ],
-            data=display_df.to_dict('records'),
-            filter_action="native",
-            sort_action="native",
-            page_size=10,
-            style_header={
-                'backgroundColor': '#034078',
-                'color': 'white',
-                'fontWeight': 'bold',
-                'textAlign': 'left',
-                'fontFamily': "'Kanit', sans-serif"
-            },
-            style_data={
-                'backgroundColor': 'white',
-                'color': '#333333',
-                'fontFamily': "'Kanit', sans-serif"
-            },
-            style_cell={
-                'padding': '10px',
-                'border': '1px solid #E0E0E0',
-                'whiteSpace': 'normal',
-                'height': 'auto',
-                'minWidth': '100px', 'width': '150px', 'maxWidth': '300px',
-                'textAlign': 'left'
-            },
-            style_data_conditional=[
-                {
-                    'if': {'row_index': 'odd'},
-                    'backgroundColor': '#F8F8F8'
-                }
-            ],
-            export_format="xlsx",
-            export_headers="display"
-        )
+        d = current_data()
+        with metrics.phase('filter'):
+            positions = d.filter_positions(selected_keyword, selected_universities, selected_faculties)
+        with metrics.phase('table'):
+            return d.table_page(positions, page_current, page_size, filter_query, sort_by)
+
+    # ไฟล์ Excel ของทุกแถวที่ผ่านตัวกรองด้านบนและเงื่อนไขกรอง/เรียงของตาราง สร้างเมื่อกดปุ่มเท่านั้น
+    @app.callback(
+        Output('table-download', 'data'),
+        [Input('export-table-button', 'n_clicks')],
+        [State('table-container', 'sort_by'),
+         State('table-container', 'filter_query'),
+         State('keyword-filter-dropdown', 'value'),
+         State('university-filter-dropdown', 'value'),
+         State('faculty-filter-dropdown', 'value')],
+        prevent_initial_call=True
+    )
+    @metrics.track
+    def export_table(n_clicks, sort_by, filter_query, selected_keyword, selected_universities, selected_faculties):
+        d = current_data()
+        with metrics.phase('filter'):
+            positions = d.filter_positions(selected_keyword, selected_universities, selected_faculties)
+        with metrics.phase('table'):
+            frame = d.table_rows(positions, filter_query, sort_by).rename(columns=TABLE_HEADERS)
+        return dcc.send_data_frame(frame.to_excel, f"mytcas_programs_{time.strftime('%Y%m%d_%H%M%S')}.xlsx",
+                                   sheet_name='programs', index=False)
 
-        return fig, summary_text, all_programs_table
+# WSGI app สำหรับรันแบบ production หลาย worker: gunicorn -c gunicorn.conf.py (ดู gunicorn.conf.py)
+server = app.server
+metrics.init_app(server)
 
 if __name__ == '__main__':
     try:
+        # debug reloader รันสคริปต์สองโพรเซส เริ่ม watcher เฉพาะโพรเซสที่ให้บริการจริง
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_data_watcher()
         app.run(debug=True, port=8050)
     except NameError:
         print("Dash App ไม่ได้ถูกสร้างขึ้นเนื่องจากไม่มีข้อมูลหรือมีข้อผิดพลาดร้ายแรงในการเตรียมข้อมูล. กรุณาแก้ไขไฟล์ 'mytcas_scrape.xlsx' หรือตรวจสอบการประมวลผลข้อมูล.")
\ No newline at end of file
@@ -0,0 +1,177 @@
+import html
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+from dash.exceptions import PreventUpdate
+from flask import Response, g, has_request_context, jsonify, request
+
+UPDATE_PATH = '_dash-update-component'
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+class CallbackMetrics:
+    """เวลาและขนาด response ของ callback ฝั่งเซิร์ฟเวอร์ เก็บ window รายการล่าสุดต่อ callback
+
+    ต่อหนึ่ง request ของ /_dash-update-component จะบันทึก
+    - total: เวลาตั้งแต่ Flask รับ request จนได้ response (ยังไม่บีบอัด)
+    - phase ที่ callback ระบุเองด้วย `with metrics.phase('filter'):` (filter, aggregate, figure ฯลฯ)
+    - other: เวลาใน callback ที่ไม่อยู่ใน phase ใด, serialize: total ลบเวลาใน callback (แปลงผลเป็น JSON ของ Dash)
+    - bytes: ขนาด JSON ของ response ก่อนบีบอัด
+    ข้อมูลเป็นของแต่ละโพรเซส: เมื่อรันหลาย worker แต่ละ worker ตอบด้วยตัวเลขของตัวเอง (ดู pid ในผลลัพธ์)"""
+
+    def __init__(self, window=500):
+        self.window = window
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.calls = Counter()
+        self.errors = Counter()
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def track(self, func):
+        """ครอบฟังก์ชัน callback (วางใต้ @app.callback) เพื่อจับชื่อและเวลาที่ใช้ในฟังก์ชัน"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not has_request_context():
+                return func(*args, **kwargs)
+            g.metrics_callback = func.__name__
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except PreventUpdate:
+                raise
+            except Exception:
+                with self._lock:
+                    self.errors[func.__name__] += 1
+                raise
+            finally:
+                g.metrics_callback_seconds = time.perf_counter() - start
+        return wrapper
+
+    @contextmanager
+    def phase(self, name):
+        if not has_request_context():
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases = g.setdefault('metrics_phases', {})
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+    def init_app(self, server):
+        """ติดตั้ง hook วัดเวลาใน Flask server ของ Dash และเพิ่ม /metrics กับ /diagnostics"""
+        server.before_request(self._before_request)
+        server.after_request(self._after_request)
+        server.add_url_rule('/metrics', 'callback_metrics', self._metrics_view)
+        server.add_url_rule('/diagnostics', 'callback_diagnostics', self._diagnostics_view)
+
+    def _before_request(self):
+        if request.path.endswith(UPDATE_PATH):
+            g.metrics_start = time.perf_counter()
+
+    def _after_request(self, response):
+        start = g.get('metrics_start')
+        name = g.get('metrics_callback')
+        if start is None or name is None:
+            return response
+        total = time.perf_counter() - start
+        in_callback = g.get('metrics_callback_seconds', total)
+        phases = dict(g.get('metrics_phases', {}))
+        phases['other'] = max(0.0, in_callback - sum(phases.values()))
+        phases['serialize'] = max(0.0, total - in_callback)
+        self.record(name, total, phases, response.calculate_content_length() or 0)
+        return response
+
+    def record(self, name, seconds, phases, response_bytes):
+        with self._lock:
+            self.calls[name] += 1
+            self.samples[name].append((seconds, phases, response_bytes))
+
+    def summary(self):
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self.samples.items()}
+            calls, errors = dict(self.calls), dict(self.errors)
+        rows = []
+        for name, samples in snapshot.items():
+            ordered = sorted(s[0] for s in samples)
+            phase_totals = Counter()
+            for _, phases, _ in samples:
+                phase_totals.update(phases)
+            sizes = [s[2] for s in samples]
+            rows.append({
+                'callback': name,
+                'calls': calls.get(name, 0),
+                'errors': errors.get(name, 0),
+                'window': len(samples),
+                'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+                'p50_ms': round(_percentile(ordered, 0.5) * 1000, 2),
+                'p95_ms': round(_percentile(ordered, 0.95) * 1000, 2),
+                'max_ms': round(ordered[-1] * 1000, 2),
+                'phases_ms': {k: round(v / len(samples) * 1000, 2) for k, v in phase_totals.most_common()},
+                'mean_bytes': round(sum(sizes) / len(sizes)),
+                'max_bytes': max(sizes),
+            })
+        return sorted(rows, key=lambda r: r['p95_ms'], reverse=True)
+
+    def prometheus(self):
+        """ผลสรุปในรูปแบบข้อความของ Prometheus"""
+        lines = []
+        pid = os.getpid()
+        for r in self.summary():
+            labels = f'callback="{r["callback"]}",pid="{pid}"'
+            lines.append(f'dashboard_callback_calls_total{{{labels}}} {r["calls"]}')
+            lines.append(f'dashboard_callback_errors_total{{{labels}}} {r["errors"]}')
+            for q in ('p50', 'p95', 'max'):
+                lines.append(f'dashboard_callback_latency_ms{{{labels},stat="{q}"}} {r[q + "_ms"]}')
+            for phase, ms in r['phases_ms'].items():
+                lines.append(f'dashboard_callback_phase_ms{{{labels},phase="{phase}"}} {ms}')
+            lines.append(f'dashboard_callback_response_bytes{{{labels},stat="mean"}} {r["mean_bytes"]}')
+            lines.append(f'dashboard_callback_response_bytes{{{labels},stat="max"}} {r["max_bytes"]}')
+        return '\n'.join(lines) + '\n'
+
+    def _metrics_view(self):
+        if request.args.get('format') == 'prometheus':
+            return Response(self.prometheus(), mimetype='text/plain; version=0.0.4')
+        return jsonify({
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.started),
+            'window': self.window,
+            'callbacks': self.summary(),
+        })
+
+    def _diagnostics_view(self):
+        rows = self.summary()
+        phases = sorted({p for r in rows for p in r['phases_ms']})
+        head = ''.join(f'<th>{html.escape(h)}</th>' for h in
+                       ['callback', 'calls', 'errors', 'mean (ms)', 'p50 (ms)', 'p95 (ms)', 'max (ms)']
+                       + [f'{p} (ms)' for p in phases] + ['mean bytes', 'max bytes'])
+        body = ''.join(
+            '<tr>' + ''.join(f'<td>{html.escape(str(v))}</td>' for v in
+                             [r['callback'], r['calls'], r['errors'], r['mean_ms'], r['p50_ms'], r['p95_ms'], r['max_ms']]
+                             + [r['phases_ms'].get(p, '') for p in phases] + [f"{r['mean_bytes']:,}", f"{r['max_bytes']:,}"])
+            + '</tr>'
+            for r in rows
+        ) or f'<tr><td colspan="{9 + len(phases)}">ยังไม่มี callback ถูกเรียก</td></tr>'
+        page = f"""<!DOCTYPE html>
+<html lang="th"><head><meta charset="utf-8"><meta http-equiv="refresh" content="10">
+<title>Dashboard diagnostics</title>
+<style>
+body {{ font-family: 'Kanit', sans-serif; background: #F0F8FF; color: #333333; padding: 20px 40px; }}
+h1 {{ color: #001F54; }}
+table {{ border-collapse: collapse; background: #FFFFFF; }}
+th, td {{ border: 1px solid #E0E0E0; padding: 6px 10px; text-align: right; }}
+th {{ background: #034078; color: #FFFFFF; }}
+td:first-child {{ text-align: left; }}
+</style></head><body>
+<h1>เวลาและขนาด response ของ callback 🩺</h1>
+<p>worker pid {os.getpid()} · {self.window} request ล่าสุดต่อ callback · ขนาดก่อนบีบอัด · เรียงตาม p95 · รีเฟรชทุก 10 วินาที
+· <a href="metrics">JSON</a> · <a href="metrics?format=prometheus">Prometheus</a></p>
+<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>
+</body></html>"""
+        return Response(page, mimetype='text/html')
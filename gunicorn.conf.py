@@ -0,0 +1,39 @@
+"""ตั้งค่า gunicorn สำหรับรัน dashboard แบบ production
+
+    gunicorn -c gunicorn.conf.py
+    DASHBOARD_WORKERS=8 DASHBOARD_BIND=0.0.0.0:80 gunicorn -c gunicorn.conf.py
+
+bind เริ่มต้นที่ 127.0.0.1 เพราะ /metrics และ /diagnostics (dashboard_metrics.py) ไม่มีการยืนยันตัวตน
+หากเปิดให้เข้าจากภายนอก ควรวางไว้หลัง reverse proxy ที่ส่งต่อเฉพาะหน้าแดชบอร์ดหรือจำกัดการเข้าถึงสองเส้นทางนี้
+
+preload_app: โหลดและเตรียมข้อมูลครั้งเดียวในโพรเซสหลักก่อน fork ทุก worker จึงใช้หน่วยความจำชุดเดียวกัน
+แบบ copy-on-write (แคช Feather แบบไม่บีบอัดถูก memory-map คอลัมน์ที่แปลงแบบ zero-copy ได้จึงอยู่ใน page cache
+ที่ใช้ร่วมกันอยู่แล้ว) ไฟล์ข้อมูลใหม่ที่ watcher พบหลัง fork จะถูกโหลดแยกในแต่ละ worker จนกว่า worker นั้นจะถูก
+เริ่มใหม่ (max_requests หรือ kill -HUP) ซึ่งจะได้ข้อมูลชุดล่าสุดจากโพรเซสหลักร่วมกันอีกครั้ง
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = "dashboard:server"
+bind = os.environ.get("DASHBOARD_BIND", "127.0.0.1:8050")
+workers = int(os.environ.get("DASHBOARD_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get("DASHBOARD_THREADS", 2))
+preload_app = True
+timeout = 60
+# เริ่ม worker ใหม่เป็นระยะ กันหน่วยความจำโตจาก cache ของแต่ละ worker
+max_requests = 2000
+max_requests_jitter = 200
+
+def pre_fork(server, worker):
+    # ตามข้อมูลให้ทันในโพรเซสหลักก่อน fork (โหลดเฉพาะเมื่อมีไฟล์ใหม่กว่าหรือ signature เปลี่ยนจากที่โหลดไว้)
+    # worker ทุกตัวรวมถึงตัวที่เริ่มใหม่ภายหลังจึงได้ข้อมูลชุดเดียวกันที่ใช้ page ร่วมกัน แทนการโหลดเองทีละตัว
+    import dashboard
+    dashboard.reload_if_changed()
+    # ย้าย object ที่โหลดไว้ออกจากการตรวจของ GC เพื่อไม่ให้ GC ใน worker เขียนทับ page ที่ใช้ร่วมกัน
+    gc.freeze()
+
+def post_fork(server, worker):
+    # thread ไม่ติดไปกับการ fork: เริ่ม watcher ของแต่ละ worker สำหรับไฟล์ที่มาหลังจากนี้
+    import dashboard
+    dashboard.start_data_watcher()
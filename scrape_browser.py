@@ -0,0 +1,120 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+class _Slot:
+    __slots__ = ("context", "page", "uses")
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+class BrowserPool:
+    """Chromium หนึ่งโพรเซสพร้อม context ที่สร้างไว้ล่วงหน้า size ชุด (context ละหนึ่งหน้า)
+
+    ยืมหน้าด้วย `async with pool.page() as page:` แล้วคืนเข้า pool เมื่อจบ context ที่ถูกใช้ครบ
+    recycle_after ครั้งจะถูกปิดและสร้างใหม่ เพื่อไม่ให้หน่วยความจำของหน้า (cache, JS heap) โตไปเรื่อย ๆ
+    เมื่อรันเป็น service (ดู scrape_service.py) pool ถูกใช้ซ้ำข้ามหลายงาน จึงไม่ต้องเปิด browser ใหม่ทุกรอบ"""
+
+    def __init__(self, size=3, recycle_after=200, headless=True, context_options=None, request_filter=None):
+        self.size = max(1, size)
+        self.recycle_after = recycle_after          # None = ไม่ recycle (เช่น การรันครั้งเดียว)
+        self.headless = headless
+        self.context_options = context_options or {}
+        self.request_filter = request_filter        # RequestFilter ที่ติดตั้งกับทุก context ของ pool
+        self.playwright = None
+        self.browser = None
+        self.slots = asyncio.Queue()
+        self.leases = 0
+        self.recycled = 0
+        self.relaunches = 0
+        self.recycle_errors = 0
+        self._launch_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        self.playwright = await async_playwright().start()
+        await self._launch()
+        for _ in range(self.size):
+            self.slots.put_nowait(await self._new_slot())
+        print(f"🌐 เปิด browser พร้อม context {self.size} ชุด")
+
+    async def _launch(self):
+        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+
+    async def _new_slot(self):
+        # browser อาจปิดตัวเอง (crash/ถูก kill) ระหว่าง service ทำงาน: เปิดใหม่ก่อนสร้าง context
+        async with self._launch_lock:
+            if not self.browser.is_connected():
+                self.relaunches += 1
+                print("♻️ browser หลุดการเชื่อมต่อ เปิดใหม่")
+                await self._launch()
+        context = await self.browser.new_context(**self.context_options)
+        if self.request_filter:
+            await self.request_filter.attach(context)
+        return _Slot(context, await context.new_page())
+
+    async def _recycle(self, slot):
+        try:
+            await slot.context.close()
+        except Exception:
+            pass  # context ของ browser ที่ปิดไปแล้ว
+        slot = await self._new_slot()
+        self.recycled += 1
+        return slot
+
+    @asynccontextmanager
+    async def page(self):
+        """ยืมหน้าหนึ่งหน้าจาก pool (รอหากทุกหน้ากำลังถูกใช้)
+
+        ช่องที่ recycle ไม่สำเร็จถูกคืนเข้า pool เป็น None (context เดิมถูกปิดไปแล้ว) แล้วสร้างใหม่เมื่อถูกยืมครั้งถัดไป
+        หากยังสร้างไม่ได้ ช่องนั้นกลับเข้า pool เป็น None อีกครั้งและ error ถูกส่งต่อให้ผู้เรียก"""
+        slot = await self.slots.get()
+        if slot is None:
+            try:
+                slot = await self._new_slot()
+            except BaseException:
+                self.slots.put_nowait(None)
+                raise
+        self.leases += 1
+        try:
+            yield slot.page
+        finally:
+            slot.uses += 1
+            try:
+                if slot.page.is_closed() or (self.recycle_after and slot.uses >= self.recycle_after):
+                    slot = await self._recycle(slot)
+            except Exception as e:
+                self.recycle_errors += 1
+                print(f"⚠️ สร้าง context ใหม่แทนชุดเดิมไม่สำเร็จ ({e}) จะลองใหม่เมื่อถูกยืมครั้งถัดไป")
+                slot = None
+            finally:
+                self.slots.put_nowait(slot)
+
+    def stats(self):
+        return {"size": self.size, "leases": self.leases, "recycled": self.recycled, "relaunches": self.relaunches,
+                "recycle_errors": self.recycle_errors, "idle": self.slots.qsize()}
+
+    async def close(self):
+        while not self.slots.empty():
+            slot = self.slots.get_nowait()
+            if slot is None:
+                continue
+            try:
+                await slot.context.close()
+            except Exception:
+                pass
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
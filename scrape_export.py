@@ -0,0 +1,58 @@
+import csv
+import json
+
+from openpyxl import Workbook
+
+# keywords: ทุกคำค้นที่พบหลักสูตรนี้ คั่นด้วย " | " (แต่ละคำค้นยังได้แถวของตัวเองตามคอลัมน์ keyword)
+FIELDS = ["keyword", "program_name", "faculty", "university", "program_type", "tuition_fee", "url", "scrape_time",
+          "keywords"]
+
+class RecordWriter:
+    """เขียนรายละเอียดหลักสูตรลงไฟล์ทันทีที่ได้มาแต่ละรายการ (CSV, JSON Lines และ xlsx แบบ write-only)
+
+    CSV/JSONL ถูก flush ทุกแถว จึงมีผลลัพธ์บางส่วนอยู่บนดิสก์ตลอดการรัน ส่วน xlsx ใช้ workbook แบบ
+    write_only ของ openpyxl ที่ส่งแถวลงไฟล์ชั่วคราวแทนการเก็บทั้งชีตในหน่วยความจำ และจะได้ไฟล์เมื่อ close()"""
+
+    def __init__(self, prefix, formats=("csv", "jsonl", "xlsx")):
+        self.prefix = prefix
+        self.formats = set(formats)
+        self.paths = {fmt: f"{prefix}.{fmt}" for fmt in formats}
+        self.count = 0
+        self._csv_file = self._csv = self._jsonl_file = None
+        self._workbook = self._sheet = None
+
+        if "csv" in self.formats:
+            self._csv_file = open(self.paths["csv"], "w", newline="", encoding="utf-8-sig")
+            self._csv = csv.DictWriter(self._csv_file, fieldnames=FIELDS, extrasaction="ignore")
+            self._csv.writeheader()
+            self._csv_file.flush()
+        if "jsonl" in self.formats:
+            self._jsonl_file = open(self.paths["jsonl"], "w", encoding="utf-8")
+        if "xlsx" in self.formats:
+            self._workbook = Workbook(write_only=True)
+            self._sheet = self._workbook.create_sheet()
+            self._sheet.append(FIELDS)
+
+    def write(self, record):
+        if self._csv:
+            self._csv.writerow(record)
+            self._csv_file.flush()
+        if self._jsonl_file:
+            self._jsonl_file.write(json.dumps({k: record.get(k) for k in FIELDS}, ensure_ascii=False) + "\n")
+            self._jsonl_file.flush()
+        if self._sheet is not None:
+            self._sheet.append([record.get(k) for k in FIELDS])
+        self.count += 1
+
+    def close(self):
+        """ปิดไฟล์ทั้งหมดและบันทึก xlsx คืน dict {รูปแบบ: path}"""
+        if self._csv_file:
+            self._csv_file.close()
+            self._csv_file = self._csv = None
+        if self._jsonl_file:
+            self._jsonl_file.close()
+            self._jsonl_file = None
+        if self._workbook is not None:
+            self._workbook.save(self.paths["xlsx"])
+            self._workbook = self._sheet = None
+        return dict(self.paths)
@@ -0,0 +1,154 @@
+import asyncio
+import random
+import time
+from collections import Counter, deque
+from email.utils import parsedate_to_datetime
+
+import requests
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+# ประเภทความล้มเหลวที่ลองใหม่แล้วมีโอกาสสำเร็จ (ชั่วคราวหรือเกิดจากการถูกจำกัดความถี่)
+RETRYABLE_KINDS = {"timeout", "navigation", "selector_miss", "http_429", "http_5xx"}
+# ประเภทที่บอกว่าเซิร์ฟเวอร์รับภาระไม่ไหว ให้ลดความถี่ทันทีโดยไม่รอดูอัตราความล้มเหลว
+THROTTLE_KINDS = {"http_429", "http_5xx"}
+
+class ScrapeError(Exception):
+    """ความล้มเหลวที่จัดประเภทแล้ว partial คือข้อมูลบางส่วนที่ได้ก่อนล้มเหลว (ถ้ามี)"""
+    def __init__(self, kind, message="", retry_after=None, partial=None):
+        super().__init__(message or kind)
+        self.kind = kind
+        self.retry_after = retry_after
+        self.partial = partial
+
+def _http_kind(status):
+    if status == 429:
+        return "http_429"
+    if status >= 500:
+        return "http_5xx"
+    return "http_4xx"
+
+def parse_retry_after(value):
+    """Retry-After เป็นวินาทีหรือวันที่แบบ HTTP คืนจำนวนวินาที (None หากอ่านไม่ได้)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def check_status(status, headers=None):
+    """แปลง HTTP status ที่ผิดปกติเป็น ScrapeError (ใช้กับ response ของ Playwright)"""
+    if status is not None and status >= 400:
+        retry_after = parse_retry_after((headers or {}).get("retry-after"))
+        raise ScrapeError(_http_kind(status), f"HTTP {status}", retry_after=retry_after)
+
+def classify_error(exc):
+    """คืน (ประเภท, retry_after) ของ exception จาก requests/Playwright/ScrapeError"""
+    if isinstance(exc, ScrapeError):
+        return exc.kind, exc.retry_after
+    if isinstance(exc, (PlaywrightTimeoutError, asyncio.TimeoutError, requests.Timeout)):
+        return "timeout", None
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return _http_kind(exc.response.status_code), parse_retry_after(exc.response.headers.get("Retry-After"))
+    if isinstance(exc, requests.ConnectionError):
+        return "navigation", None
+    if isinstance(exc, PlaywrightError) and ("net::" in str(exc) or "Navigation" in str(exc)):
+        return "navigation", None
+    return "other", None
+
+class RetryPolicy:
+    """Exponential backoff แบบ full jitter: รอสุ่มระหว่าง 0 ถึง min(max_delay, base_delay * 2^attempt)
+    เพื่อไม่ให้ worker ที่ล้มเหลวพร้อมกันกลับมายิง request พร้อมกันอีก"""
+    def __init__(self, retries=3, base_delay=1.0, max_delay=30.0):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        # เคารพ Retry-After ของเซิร์ฟเวอร์ แต่ไม่รอนานเกิน max_delay
+        return max(backoff, min(retry_after or 0, self.max_delay))
+
+class CircuitBreaker:
+    """ปรับความถี่รวมของ RateLimiter ตามอัตราความล้มเหลวล่าสุด (AIMD)
+
+    - 429/5xx หรืออัตราความล้มเหลวเกิน slow_ratio: ลด rate ลงครึ่งหนึ่ง
+    - อัตราความล้มเหลวเกิน trip_ratio: เปิดวงจร หยุด request ทั้งหมด cooldown วินาที
+    - สำเร็จต่อเนื่อง: เพิ่ม rate ทีละ 25% จนกลับถึงค่าที่ตั้งไว้"""
+    def __init__(self, limiter, window=20, slow_ratio=0.2, trip_ratio=0.5, cooldown=30.0, min_rate=0.1):
+        self.limiter = limiter
+        self.base_rate = limiter.rate
+        self.outcomes = deque(maxlen=window)
+        self.slow_ratio = slow_ratio
+        self.trip_ratio = trip_ratio
+        self.cooldown = cooldown
+        self.min_rate = min(min_rate, limiter.rate)
+        self.since_adjust = 0
+        self.trips = 0
+        self.slowdowns = 0
+
+    def error_ratio(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def _set_rate(self, rate):
+        self.limiter.rate = min(self.base_rate, max(self.min_rate, rate))
+        self.since_adjust = 0
+
+    def record(self, success, kind=None):
+        self.outcomes.append(success)
+        self.since_adjust += 1
+        ratio = self.error_ratio()
+        full = len(self.outcomes) == self.outcomes.maxlen
+
+        if not success and full and ratio >= self.trip_ratio:
+            self.trips += 1
+            self.limiter.pause(self.cooldown)
+            self._set_rate(self.limiter.rate / 2)
+            self.outcomes.clear()
+            print(f"   🛑 อัตราความล้มเหลว {ratio:.0%}: หยุดส่ง request {self.cooldown:.0f} วินาที "
+                  f"แล้วลดความถี่เหลือ {self.limiter.rate:.2f} req/s")
+        elif not success and (kind in THROTTLE_KINDS or (ratio > self.slow_ratio and self.since_adjust >= self.outcomes.maxlen // 2)):
+            self.slowdowns += 1
+            self._set_rate(self.limiter.rate / 2)
+            print(f"   🐢 ลดความถี่เหลือ {self.limiter.rate:.2f} req/s ({kind}, ล้มเหลว {ratio:.0%})")
+        elif success and full and ratio <= self.slow_ratio / 2 and self.limiter.rate < self.base_rate \
+                and self.since_adjust >= self.outcomes.maxlen // 2:
+            self._set_rate(self.limiter.rate * 1.25)
+
+class FailureReport:
+    """บันทึกความล้มเหลวรายรายการของการรัน (ทั้งที่ลองใหม่สำเร็จและที่ล้มเหลวถาวร)"""
+    def __init__(self):
+        self.rows = []
+
+    def add(self, stage, target, kind, attempts, outcome, message=""):
+        # outcome: recovered = สำเร็จหลังลองใหม่, partial = ได้ข้อมูลไม่ครบ, failed = ไม่ได้ข้อมูล
+        self.rows.append({
+            "stage": stage,
+            "target": target,
+            "kind": kind,
+            "attempts": attempts,
+            "outcome": outcome,
+            "message": str(message)[:200],
+        })
+
+    def summary(self):
+        counts = Counter((r["stage"], r["kind"], r["outcome"]) for r in self.rows)
+        return [
+            {"stage": stage, "kind": kind, "outcome": outcome, "count": count}
+            for (stage, kind, outcome), count in counts.most_common()
+        ]
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            print("✅ ไม่มีความล้มเหลวระหว่างการรัน")
+            return
+        print("🧾 สรุปความล้มเหลว:")
+        print(f"  {'stage':<8}{'kind':<15}{'outcome':<11}{'count':>7}")
+        for r in rows:
+            print(f"  {r['stage']:<8}{r['kind']:<15}{r['outcome']:<11}{r['count']:>7}")
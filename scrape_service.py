@@ -0,0 +1,212 @@
+"""Scraper แบบ service: เปิด Chromium และ context ค้างไว้ แล้วรับงาน (รายการคำค้น) ผ่าน TCP บน localhost
+
+    python scrape_service.py serve --port 8765 --pool-size 3 --recycle-after 200
+    python scrape_service.py submit "วิศวกรรม คอมพิวเตอร์" -f keywords.txt --port 8765
+    python scrape_service.py status --port 8765
+
+โปรโตคอลเป็น JSON หนึ่งบรรทัดต่อข้อความ: client ส่ง {"keywords": [...], ...} แล้ว service ตอบ
+{"status": "queued", ...} ทันที และ {"status": "done", ...} (หรือ "error") เมื่องานเสร็จ
+งานถูกรันทีละงานตามลำดับ เพราะทุกงานใช้ browser และ rate limit ของเว็บไซต์เดียวกัน
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+
+from scrape_store import HistoryStore, ProgramStore
+from scrape_tuition import MyTCASScraper, RequestFilter, read_keywords
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# ตัวเลือกของงานที่ client กำหนดเองได้ (ส่งต่อให้ MyTCASScraper)
+JOB_OPTIONS = {"rate", "burst", "retries", "use_http", "output_formats"}
+
+class ScrapeService:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, pool_size=3, recycle_after=200, out_dir=".",
+                 prefix="mytcas_scraped", store_path="mytcas_store.sqlite3", history_path="mytcas_history.sqlite3"):
+        self.host = host
+        self.port = port
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.store = ProgramStore(store_path)
+        self.history = HistoryStore(history_path) if history_path else None
+        # scraper ตัวแม่แบบ ใช้สร้าง BrowserPool ที่ตั้งค่าเหมือนการรันปกติ (locale, user agent, RequestFilter)
+        self.pool = MyTCASScraper(concurrency=pool_size, request_filter=RequestFilter()).new_browser_pool(recycle_after)
+        self.jobs = asyncio.Queue()
+        self.job_ids = itertools.count(1)
+        self.current = None
+        self.completed = 0
+
+    async def serve(self):
+        await self.pool.start()
+        runner = asyncio.create_task(self._run_jobs())
+        server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        print(f"🛎️ scraper service พร้อมรับงานที่ {self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            runner.cancel()
+            await self.pool.close()
+            self.store.close()
+            if self.history is not None:
+                self.history.close()
+
+    def status(self):
+        return {
+            "status": "ok",
+            "current_job": self.current,
+            "queued": self.jobs.qsize(),
+            "completed": self.completed,
+            "pool": self.pool.stats(),
+        }
+
+    async def _handle_client(self, reader, writer):
+        try:
+            line = await reader.readline()
+            try:
+                request = json.loads(line or b"{}")
+            except ValueError:
+                request = {}
+            if request.get("command") == "status":
+                await self._send(writer, self.status())
+                return
+
+            keywords = [kw.strip() for kw in request.get("keywords") or [] if isinstance(kw, str) and kw.strip()]
+            if not keywords:
+                await self._send(writer, {"status": "error", "message": "ต้องระบุ keywords อย่างน้อยหนึ่งคำ"})
+                return
+            job = {
+                "id": next(self.job_ids),
+                "keywords": keywords,
+                "resume_hours": request.get("resume_hours"),
+                "options": {k: v for k, v in request.items() if k in JOB_OPTIONS},
+                "done": asyncio.get_running_loop().create_future(),
+            }
+            self.jobs.put_nowait(job)
+            await self._send(writer, {"status": "queued", "job": job["id"], "position": self.jobs.qsize()})
+            # รอผลของงานแล้วตอบกลับบน connection เดิม (client ปิดก่อนได้ งานยังรันต่อ)
+            await self._send(writer, await asyncio.shield(job["done"]))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, message):
+        writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def _run_jobs(self):
+        while True:
+            job = await self.jobs.get()
+            self.current = job["id"]
+            started = time.perf_counter()
+            print(f"\n📥 เริ่มงาน #{job['id']}: {job['keywords']}")
+            try:
+                result = await self._run_job(job)
+                result.update(status="done", seconds=round(time.perf_counter() - started, 1))
+            except Exception as e:
+                print(f"❌ งาน #{job['id']} ล้มเหลว: {e}")
+                result = {"status": "error", "job": job["id"], "message": str(e)}
+            self.current = None
+            self.completed += 1
+            if not job["done"].done():
+                job["done"].set_result(result)
+
+    async def _run_job(self, job):
+        resume_hours = job["resume_hours"]
+        scraper = MyTCASScraper(
+            concurrency=self.pool.size,
+            store=self.store,
+            history=self.history,
+            resume_max_age=resume_hours * 3600 if resume_hours is not None else None,
+            output_prefix=os.path.join(self.out_dir, f"{self.prefix}_job{job['id']}"),
+            **job["options"],
+        )
+        await scraper.scrape(job["keywords"], pool=self.pool)
+        files = scraper.save_data()
+        return {
+            "job": job["id"],
+            "rows": scraper.collected_count,
+            "files": files,
+            "dedup": scraper.dedup_stats,
+            "failures": scraper.failures.summary(),
+            "pool": self.pool.stats(),
+        }
+
+async def send_request(request, host=DEFAULT_HOST, port=DEFAULT_PORT, wait=True):
+    """ส่งคำขอไปยัง service แล้วพิมพ์ทุกข้อความที่ได้รับ คืนข้อความสุดท้าย"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+    await writer.drain()
+    last = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        last = json.loads(line)
+        print(json.dumps(last, ensure_ascii=False, indent=2))
+        if not wait or last.get("status") != "queued":
+            break
+    writer.close()
+    return last
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="MyTCAS scraper แบบ service ที่เปิด browser ค้างไว้ระหว่างงาน")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="เปิด service")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--pool-size", type=int, default=3, help="จำนวน context/หน้าที่เปิดค้างไว้")
+    serve.add_argument("--recycle-after", type=int, default=200, help="สร้าง context ใหม่หลังใช้งานครบจำนวนหน้านี้")
+    serve.add_argument("-o", "--out-dir", default=".", help="โฟลเดอร์สำหรับไฟล์ผลลัพธ์ของแต่ละงาน")
+    serve.add_argument("--prefix", default="mytcas_scraped", help="คำนำหน้าชื่อไฟล์ผลลัพธ์")
+    serve.add_argument("--store", default="mytcas_store.sqlite3")
+    serve.add_argument("--history", default="mytcas_history.sqlite3", help="ไฟล์ประวัติค่าเล่าเรียน ('' = ไม่บันทึก)")
+
+    submit = commands.add_parser("submit", help="ส่งงานให้ service")
+    submit.add_argument("keywords", nargs="*")
+    submit.add_argument("-f", "--keywords-file", action="append", default=[], metavar="PATH",
+                        help="ไฟล์คำค้น หนึ่งคำต่อบรรทัด ใช้ '-' เพื่ออ่านจาก stdin")
+    submit.add_argument("--resume-hours", type=float)
+    submit.add_argument("--rate", type=float)
+    submit.add_argument("--no-wait", action="store_true", help="ไม่รอให้งานเสร็จ")
+    submit.add_argument("--host", default=DEFAULT_HOST)
+    submit.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    status = commands.add_parser("status", help="ดูสถานะ service")
+    status.add_argument("--host", default=DEFAULT_HOST)
+    status.add_argument("--port", type=int, default=DEFAULT_PORT)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "serve":
+        os.makedirs(args.out_dir, exist_ok=True)
+        service = ScrapeService(args.host, args.port, args.pool_size, args.recycle_after, args.out_dir,
+                                args.prefix, args.store, args.history or None)
+        try:
+            asyncio.run(service.serve())
+        except KeyboardInterrupt:
+            print("👋 ปิด service")
+        return 0
+    if args.command == "status":
+        asyncio.run(send_request({"command": "status"}, args.host, args.port))
+        return 0
+
+    keywords = read_keywords(args.keywords_file, args.keywords)
+    if not keywords:
+        print("❌ ไม่มีคำค้น")
+        return 2
+    request = {"keywords": keywords, "resume_hours": args.resume_hours}
+    if args.rate is not None:
+        request["rate"] = args.rate
+    result = asyncio.run(send_request(request, args.host, args.port, wait=not args.no_wait))
+    return 0 if result and result.get("status") in ("done", "queued") else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import sqlite3
+import time
+
+import pandas as pd
+
+from tuition_parser import parse_tuition_fees
+
+class ProgramStore:
+    """ที่เก็บรายละเอียดหลักสูตรแบบ SQLite (key = URL ของหลักสูตร) บันทึกทันทีทีละรายการ"""
+
+    COLUMNS = ["url", "keyword", "program_name", "faculty", "university", "program_type",
+               "tuition_fee", "scrape_time", "fetched_at", "etag", "last_modified", "content_hash"]
+    VALIDATORS = {"etag", "last_modified", "content_hash"}
+
+    def __init__(self, path="mytcas_store.sqlite3"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS programs (
+                url TEXT PRIMARY KEY,
+                keyword TEXT,
+                program_name TEXT,
+                faculty TEXT,
+                university TEXT,
+                program_type TEXT,
+                tuition_fee TEXT,
+                scrape_time TEXT,
+                fetched_at REAL,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, url):
+        row = self.conn.execute("SELECT * FROM programs WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def is_fresh(self, url, max_age):
+        """True หาก URL นี้ถูกดึงมาแล้วภายใน max_age วินาที"""
+        row = self.conn.execute("SELECT fetched_at FROM programs WHERE url = ?", (url,)).fetchone()
+        return bool(row and row["fetched_at"] and time.time() - row["fetched_at"] <= max_age)
+
+    def save(self, details, etag=None, last_modified=None, content_hash=None):
+        """บันทึกหรืออัปเดตรายละเอียดของ URL นี้ validator (etag, last_modified, content_hash) ที่ไม่ได้ส่งมา
+        เช่นเมื่อดึงผ่าน Playwright จะคงค่าเดิมที่ได้จาก HTTP ไว้ เพื่อให้ยังส่ง conditional request ได้ในรอบถัดไป"""
+        record = {col: details.get(col) for col in self.COLUMNS}
+        record.update(fetched_at=time.time(), etag=etag, last_modified=last_modified, content_hash=content_hash)
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        updates = ", ".join(
+            f"{col} = COALESCE(excluded.{col}, {col})" if col in self.VALIDATORS else f"{col} = excluded.{col}"
+            for col in self.COLUMNS if col != "url"
+        )
+        self.conn.execute(
+            f"INSERT INTO programs ({', '.join(self.COLUMNS)}) VALUES ({placeholders}) "
+            f"ON CONFLICT(url) DO UPDATE SET {updates}",
+            [record[col] for col in self.COLUMNS]
+        )
+        self.conn.commit()
+
+    def touch(self, url):
+        """ต่ออายุข้อมูลเดิมเมื่อเว็บยืนยันว่าหน้าไม่เปลี่ยนแปลง (304 หรือ hash เท่าเดิม)"""
+        self.conn.execute("UPDATE programs SET fetched_at = ? WHERE url = ?", (time.time(), url))
+        self.conn.commit()
+
+    def all(self):
+        return [dict(row) for row in self.conn.execute("SELECT * FROM programs ORDER BY url")]
+
+    def close(self):
+        self.conn.close()
+
+class HistoryStore:
+    """ประวัติค่าเล่าเรียนจากทุกรอบการดึงข้อมูล (append-only, ไม่ซ้ำตาม url + scrape_time)
+
+    ตาราง snapshots เป็น WITHOUT ROWID เรียงตาม (url, scrape_time) บนดิสก์ การดึงประวัติของหลักสูตรเดียว
+    จึงอ่านเป็นช่วงต่อเนื่อง ค่าเล่าเรียนต่อปีคำนวณครั้งเดียวตอนบันทึก และสรุปรายมหาวิทยาลัยรายวันไว้ใน
+    university_daily ทำให้กราฟแนวโน้มอ่านเพียงหนึ่งแถวต่อมหาวิทยาลัยต่อวัน ไม่ว่าจะสะสมข้อมูลกี่ปี"""
+
+    COLUMNS = ["url", "scrape_time", "keyword", "program_name", "faculty", "university", "program_type",
+               "tuition_fee", "tuition_fee_per_year"]
+
+    def __init__(self, path="mytcas_history.sqlite3", readonly=False):
+        self.path = path
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    url TEXT NOT NULL,
+                    scrape_time TEXT NOT NULL,
+                    keyword TEXT,
+                    program_name TEXT,
+                    faculty TEXT,
+                    university TEXT,
+                    program_type TEXT,
+                    tuition_fee TEXT,
+                    tuition_fee_per_year REAL,
+                    PRIMARY KEY (url, scrape_time)
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (scrape_time)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS university_daily (
+                    university TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    fee_sum REAL,
+                    fee_count INTEGER,
+                    programs INTEGER,
+                    PRIMARY KEY (university, day)
+                ) WITHOUT ROWID
+            """)
+            self.conn.commit()
+        self.conn.row_factory = sqlite3.Row
+
+    def append(self, records):
+        """เพิ่มรายการจากหนึ่งรอบการดึง (list ของ dict หรือ DataFrame) คืนจำนวนแถวที่เพิ่มจริง
+        แถวที่ url + scrape_time ซ้ำกับที่มีอยู่แล้วจะถูกข้าม จึงนำเข้าไฟล์เดิมซ้ำได้อย่างปลอดภัย"""
+        df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+        if df.empty or "url" not in df or "scrape_time" not in df:
+            return 0
+        df = df.dropna(subset=["url", "scrape_time"]).copy()
+        df["scrape_time"] = df["scrape_time"].astype(str)
+        df["tuition_fee_per_year"] = parse_tuition_fees(df["tuition_fee"])["tuition_fee_per_year"]
+        rows = df.reindex(columns=self.COLUMNS).astype(object)
+        rows = rows.where(rows.notna(), None)
+
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO snapshots ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                rows.itertuples(index=False, name=None)
+            )
+            added = self.conn.total_changes - before
+            if added:
+                self._refresh_daily(df["scrape_time"].str[:10].unique())
+        return added
+
+    def _refresh_daily(self, days):
+        """คำนวณสรุปรายวันใหม่เฉพาะวันที่มีข้อมูลเพิ่ม (อ่านผ่าน index ของ scrape_time)"""
+        for day in days:
+            self.conn.execute("DELETE FROM university_daily WHERE day = ?", (day,))
+            self.conn.execute("""
+                INSERT INTO university_daily (university, day, fee_sum, fee_count, programs)
+                SELECT university, substr(scrape_time, 1, 10), SUM(tuition_fee_per_year),
+                       COUNT(tuition_fee_per_year), COUNT(DISTINCT url)
+                FROM snapshots
+                WHERE scrape_time >= ? AND scrape_time < ? || '~' AND university IS NOT NULL
+                GROUP BY university
+            """, (day, day))
+
+    def import_file(self, file_path, chunksize=5000):
+        """นำเข้าไฟล์ผลการดึงข้อมูล (.csv/.jsonl ทีละ chunk หรือ .xlsx ทั้งไฟล์)"""
+        if file_path.endswith(".csv"):
+            chunks = pd.read_csv(file_path, encoding="utf-8-sig", dtype=str, chunksize=chunksize)
+        elif file_path.endswith(".jsonl"):
+            chunks = pd.read_json(file_path, lines=True, dtype=False, chunksize=chunksize)
+        else:
+            chunks = [pd.read_excel(file_path)]
+        return sum(self.append(chunk) for chunk in chunks)
+
+    def program_history(self, urls):
+        """ประวัติค่าเล่าเรียนของหลักสูตรตาม URL เรียงตามเวลา"""
+        urls = list(urls)
+        if not urls:
+            return []
+        placeholders = ", ".join("?" for _ in urls)
+        return [dict(row) for row in self.conn.execute(
+            "SELECT url, scrape_time, program_name, university, tuition_fee, tuition_fee_per_year "
+            f"FROM snapshots WHERE url IN ({placeholders}) ORDER BY url, scrape_time",
+            urls
+        )]
+
+    def university_trend(self, universities=None, period_length=10):
+        """ค่าเล่าเรียนต่อปีเฉลี่ยรายมหาวิทยาลัยต่อช่วงเวลา (จาก university_daily)
+        period_length คือจำนวนตัวอักษรแรกของวันที่ที่ใช้จัดกลุ่ม (10 = รายวัน, 7 = รายเดือน, 4 = รายปี)"""
+        where, params = "", [period_length]
+        if universities:
+            universities = list(universities)
+            where = f"WHERE university IN ({', '.join('?' for _ in universities)})"
+            params.extend(universities)
+        return [dict(row) for row in self.conn.execute(
+            "SELECT university, substr(day, 1, ?) AS period, "
+            "SUM(fee_sum) / NULLIF(SUM(fee_count), 0) AS avg_fee, MAX(programs) AS programs "
+            f"FROM university_daily {where} GROUP BY university, period ORDER BY university, period",
+            params
+        )]
+
+    def time_range(self):
+        row = self.conn.execute("SELECT MIN(scrape_time), MAX(scrape_time) FROM snapshots").fetchone()
+        return tuple(row)
+
+    def close(self):
+        self.conn.close()
+
+if __name__ == "__main__":
+    # นำเข้าไฟล์ผลการดึงข้อมูลรอบก่อน ๆ เข้าประวัติ: python scrape_store.py mytcas_scraped_*.csv
+    import sys
+
+    history = HistoryStore()
+    for file_path in sys.argv[1:]:
+        print(f"📥 {file_path}: เพิ่ม {history.import_file(file_path)} แถว")
+    history.close()
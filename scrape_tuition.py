@@ -1,223 +1,1115 @@
+import argparse
 import asyncio
-from playwright.async_api import async_playwright
+import csv
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from urllib.parse import quote, urlparse
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from datetime import datetime
+from scrape_browser import BrowserPool
+from scrape_export import FIELDS, RecordWriter
+from scrape_retry import (RETRYABLE_KINDS, THROTTLE_KINDS, CircuitBreaker, FailureReport, RetryPolicy,
+                          ScrapeError, check_status, classify_error)
+from scrape_store import HistoryStore, ProgramStore
+
+HISTORY_BATCH = 500  # จำนวนแถวต่อการเพิ่มเข้า HistoryStore หนึ่งครั้งระหว่างการรัน
+HTTP_MISS_LIMIT = 5  # ปิดการดึงรายละเอียดด้วย HTTP ไปจนจบการรัน เมื่อ HTML ไม่มีข้อมูลครบติดต่อกันเท่านี้หลักสูตร
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
+NOT_FOUND = "ไม่พบข้อมูล"
+
+# Selector ที่ใช้กับ HTML แบบ static (BeautifulSoup/soupsieve) ลำดับเดียวกับฝั่ง Playwright
+HTML_TYPE_SELECTORS = [
+    "dt:-soup-contains('ประเภทหลักสูตร') + dd",
+    ".program-type",
+    "[data-field='program_type']",
+    "td:-soup-contains('ประเภทหลักสูตร') + td"
+]
+HTML_FEE_SELECTORS = [
+    "dt:-soup-contains('ค่าใช้จ่าย') + dd",
+    "dt:-soup-contains('ค่าธรรมเนียม') + dd",
+    ".fee-info",
+    ".tuition-fee",
+    "[data-field='fee']",
+    "td:-soup-contains('ค่าใช้จ่าย') + td"
+]
+
+# คีย์ที่พบได้ใน JSON ของ endpoint ค้นหา (ลองตามลำดับ) สำหรับแปลงเป็นรายการหลักสูตร
+API_NAME_KEYS = ["program_name_th", "program_name", "name_th", "title", "name"]
+API_FACULTY_KEYS = ["faculty_name_th", "faculty_name", "faculty", "field_name_th"]
+API_UNIVERSITY_KEYS = ["university_name_th", "university_name", "university", "campus_name_th"]
+API_URL_KEYS = ["url", "link", "href"]
+API_ID_KEYS = ["program_id", "id", "code"]
+
+def _first_value(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if isinstance(value, dict):
+            value = _first_value(value, ["name_th", "name", "title"])
+        if value not in (None, ""):
+            return str(value).strip()
+    return ""
+
+def _is_program_record(record):
+    """dict ที่มีรูปแบบเป็นหลักสูตร: มีชื่อหลักสูตร มหาวิทยาลัยหรือคณะ และ URL หรือรหัสหลักสูตร
+    (ป้องกันการรับ JSON อื่นที่แค่มีคีย์ id เช่น config หรือ analytics เป็นผลการค้นหา)"""
+    return bool(
+        _first_value(record, API_NAME_KEYS)
+        and (_first_value(record, API_UNIVERSITY_KEYS) or _first_value(record, API_FACULTY_KEYS))
+        and (_first_value(record, API_URL_KEYS) or _first_value(record, API_ID_KEYS))
+    )
+
+def _find_record_list(data):
+    """หา list ของหลักสูตรชุดแรกใน JSON (endpoint อาจห่อผลลัพธ์ไว้ใน data/results/items)
+    list จะถูกนับเป็นผลการค้นหาเมื่อรายการส่วนใหญ่มีรูปแบบของหลักสูตร (_is_program_record)"""
+    if isinstance(data, list):
+        if data and all(isinstance(x, dict) for x in data) and sum(map(_is_program_record, data)) * 2 > len(data):
+            return data
+        return None
+    if isinstance(data, dict):
+        for value in data.values():
+            found = _find_record_list(value)
+            if found:
+                return found
+    return None
+
+# ตัวเลือกสำหรับดึงข้อมูลในหน้า browser: [tag, ข้อความ, tag ถัดไป] = "tag ที่มีข้อความ + tag ถัดไป" หรือ CSS selector ปกติ
+DETAIL_TYPE_CANDIDATES = [
+    ["dt", "ประเภทหลักสูตร", "dd"],
+    ".program-type",
+    "[data-field='program_type']",
+    ["td", "ประเภทหลักสูตร", "td"]
+]
+DETAIL_FEE_CANDIDATES = [
+    ["dt", "ค่าใช้จ่าย", "dd"],
+    ["dt", "ค่าธรรมเนียม", "dd"],
+    ".fee-info",
+    ".tuition-fee",
+    "[data-field='fee']",
+    ["td", "ค่าใช้จ่าย", "td"]
+]
+DETAIL_WAIT_SELECTORS = [
+    "dt + dd", ".program-type", ".fee-info", ".tuition-fee", "[data-field='program_type']", "[data-field='fee']", "table tr"
+]
+
+EXTRACT_DETAILS_JS = """
+(candidates) => {
+    const text = (el) => el ? (el.innerText || el.textContent || "").trim() : "";
+    const find = (c) => {
+        if (typeof c === "string") return document.querySelector(c);
+        const [tag, label, nextTag] = c;
+        for (const el of document.querySelectorAll(tag)) {
+            const next = el.nextElementSibling;
+            if (el.textContent.includes(label) && next && next.tagName.toLowerCase() === nextTag) return next;
+        }
+        return null;
+    };
+    const first = (list) => {
+        for (const c of list) {
+            const value = text(find(c));
+            if (value) return value;
+        }
+        return "";
+    };
+    const rows = [];
+    for (const tr of document.querySelectorAll("table tr")) {
+        const cells = tr.querySelectorAll("td, th");
+        if (cells.length >= 2) rows.push([text(cells[0]), text(cells[1])]);
+    }
+    return {program_type: first(candidates.program_type), tuition_fee: first(candidates.tuition_fee), rows};
+}
+"""
+
+EXTRACT_RESULTS_JS = """
+(selectors) => {
+    for (const sel of selectors) {
+        const items = document.querySelectorAll(sel);
+        if (items.length > 0) {
+            return {
+                selector: sel,
+                items: Array.from(items, (li) => {
+                    const a = li.querySelector("a");
+                    return {text: li.innerText || li.textContent || "", href: a ? a.getAttribute("href") : null};
+                })
+            };
+        }
+    }
+    return null;
+}
+"""
+
+def _apply_table_rows(fields, rows):
+    """เติมประเภทหลักสูตร/ค่าใช้จ่ายจากคู่ (หัวตาราง, ค่า) เฉพาะ field ที่ยังไม่พบข้อมูล"""
+    for header, value in rows:
+        if "ประเภท" in header and fields["program_type"] == NOT_FOUND:
+            fields["program_type"] = value
+        if any(w in header for w in ["ค่าใช้จ่าย", "ธรรมเนียม", "ค่าเรียน"]) and fields["tuition_fee"] == NOT_FOUND:
+            fields["tuition_fee"] = value
+
+def _html_parser():
+    """ใช้ lxml หากติดตั้งไว้ (เร็วกว่า) ไม่เช่นนั้นใช้ parser มาตรฐานของ Python"""
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+HTML_PARSER = _html_parser()
+
+def parse_program_html(html):
+    """ดึงประเภทหลักสูตรและค่าใช้จ่ายจาก HTML ของหน้ารายละเอียด (dt/dd และ table tr)"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    fields = {"program_type": NOT_FOUND, "tuition_fee": NOT_FOUND}
+
+    for key, selectors in (("program_type", HTML_TYPE_SELECTORS), ("tuition_fee", HTML_FEE_SELECTORS)):
+        for sel in selectors:
+            el = soup.select_one(sel)
+            if el:
+                txt = el.get_text(" ", strip=True)
+                if txt:
+                    fields[key] = txt
+                    break
+
+    # หากยังไม่มีข้อมูล ให้ลองดึงจากตาราง
+    rows = []
+    for row in soup.select("table tr"):
+        cells = row.find_all(["td", "th"])
+        if len(cells) >= 2:
+            rows.append((cells[0].get_text(" ", strip=True), cells[1].get_text(" ", strip=True)))
+    _apply_table_rows(fields, rows)
+    return fields
+
+def _intern(value):
+    """ใช้ object สตริงเดียวกันสำหรับค่าที่ซ้ำกันมาก (คำค้น มหาวิทยาลัย คณะ ชื่อหลักสูตร)"""
+    return sys.intern(value) if type(value) is str else value
+
+class ProgramRecord:
+    """หลักสูตรหนึ่งรายการจากผลการค้นหา เก็บแบบ __slots__ (ไม่มี __dict__ ต่อ object)
+
+    ข้อความดิบของรายการค้นหา (raw_text) ไม่ได้ใช้ต่อ จึงทิ้งไปโดยปริยาย หากต้องการเก็บไว้ตรวจสอบ
+    ให้ส่ง keep_raw_text=True แล้วข้อความจะถูกบีบอัดด้วย zlib และคลายเมื่อเรียก raw_text เท่านั้น"""
+    __slots__ = ("keyword", "keywords", "program_name", "faculty", "university", "url", "_raw_text")
+
+    def __init__(self, keyword, program_name, faculty, university, url, raw_text=None, keep_raw_text=False,
+                 keywords=None):
+        self.keyword = _intern(keyword)
+        # ทุกคำค้นที่พบหลักสูตรนี้ (keyword คือคำแรก) เติมโดย dedupe_programs
+        self.keywords = tuple(_intern(kw) for kw in keywords) if keywords else (self.keyword,)
+        self.program_name = _intern(program_name)
+        self.faculty = _intern(faculty)
+        self.university = _intern(university)
+        self.url = url
+        self._raw_text = zlib.compress(raw_text.encode("utf-8")) if keep_raw_text and raw_text else None
+
+    @property
+    def raw_text(self):
+        return zlib.decompress(self._raw_text).decode("utf-8") if self._raw_text else ""
+
+    def __repr__(self):
+        return f"ProgramRecord({self.program_name!r}, {self.university!r}, {self.url!r})"
+
+class ProgramDetails(ProgramRecord):
+    """รายละเอียดหลักสูตรที่ดึงแล้ว ใช้เก็บใน collected_data แทน dict (เมื่อ keep_records=True)"""
+    __slots__ = ("program_type", "tuition_fee", "scrape_time")
+
+    def __init__(self, keyword, program_name, faculty, university, url, program_type=NOT_FOUND,
+                 tuition_fee=NOT_FOUND, scrape_time=None, keywords=None):
+        super().__init__(keyword, program_name, faculty, university, url, keywords=keywords)
+        self.program_type = _intern(program_type)
+        self.tuition_fee = _intern(tuition_fee)
+        self.scrape_time = scrape_time
+
+    @classmethod
+    def from_dict(cls, details):
+        return cls(**{name: details.get(name) for name in FIELDS})
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+def dedupe_programs(programs):
+    """รวมผลการค้นหาที่ URL ซ้ำกันข้ามคำค้นให้เหลือหลักสูตรละหนึ่งรายการ (คงลำดับที่พบครั้งแรก)
+    และเก็บทุกคำค้นที่พบไว้ใน keywords คืน (รายการที่ไม่ซ้ำ, จำนวนรายการซ้ำที่ตัดออก)"""
+    unique = {}
+    for program in programs:
+        first = unique.setdefault(program.url, program)
+        if first is not program:
+            first.keywords += tuple(kw for kw in program.keywords if kw not in first.keywords)
+    return list(unique.values()), len(programs) - len(unique)
+
+class RateLimiter:
+    """Token bucket จำกัดอัตราการส่ง request ไปยังเว็บไซต์ (ใช้ร่วมกันทุก worker)"""
+    def __init__(self, rate=1.0, burst=1):
+        self.rate = rate            # จำนวน token ที่เติมต่อวินาที
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """หยุดจ่าย token ทั้งหมดชั่วคราว (ใช้โดย CircuitBreaker เมื่อเปิดวงจร)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class TimingProfile:
+    """เก็บเวลาที่ใช้ในแต่ละขั้นตอน (goto, selector probe, extraction ฯลฯ) และตัวนับของการรัน
+    (เช่น request/bytes ที่ถูกบล็อก) แล้วสรุปตอนจบการรัน"""
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.counters = Counter()
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - start)
+
+    def summary(self):
+        rows = []
+        for name, values in self.samples.items():
+            ordered = sorted(values)
+            rows.append({
+                "step": name,
+                "count": len(values),
+                "total_s": round(sum(values), 3),
+                "mean_s": round(sum(values) / len(values), 3),
+                "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "max_s": round(ordered[-1], 3),
+            })
+        return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+    def counter_rows(self):
+        return [{"step": name, "count": value} for name, value in sorted(self.counters.items())]
+
+    def print_summary(self):
+        rows = self.summary()
+        if rows:
+            print("⏱️ สรุปเวลาที่ใช้ในแต่ละขั้นตอน:")
+            print(f"  {'step':<22}{'count':>7}{'total(s)':>11}{'mean(s)':>10}{'p95(s)':>9}{'max(s)':>9}")
+            for r in rows:
+                print(f"  {r['step']:<22}{r['count']:>7}{r['total_s']:>11.2f}{r['mean_s']:>10.2f}{r['p95_s']:>9.2f}{r['max_s']:>9.2f}")
+        for r in self.counter_rows():
+            print(f"  {r['step']:<22}{r['count']:>18,}")
+        http_tries = self.counters["http_hit"] + self.counters["http_miss"]
+        if http_tries:
+            print(f"  HTTP hit rate: {self.counters['http_hit'] / http_tries:.0%} ({self.counters['http_hit']}/{http_tries})")
+
+# host ของ MyTCAS เอง: หน้าเว็บ/API (*.mytcas.com) และ bucket ที่เว็บโหลดไฟล์ข้อมูลและ JS
+DEFAULT_ALLOWED_HOSTS = ("mytcas.com", "my-tcas.s3.ap-southeast-1.amazonaws.com")
+# request ที่ถูก abort ไม่มี response ให้วัดขนาด จึงรายงาน bytes ที่ประหยัดได้จากขนาดโดยประมาณต่อประเภท
+BLOCKED_SIZE_ESTIMATES = {"image": 40_000, "media": 500_000, "font": 50_000, "stylesheet": 20_000, "script": 60_000}
+DEFAULT_BLOCKED_SIZE = 5_000
+
+class RequestFilter:
+    """Allow-list ของ request ใน browser: โหลดเฉพาะ document/XHR/fetch (และ script ที่หน้าเว็บต้องใช้)
+    จาก host ใน allowed_hosts (MyTCAS และ API/CDN ของเว็บ) ส่วนรูปภาพ ฟอนต์ มีเดีย analytics และ third-party
+    อื่น ๆ จะถูก abort host ของ XHR/script ที่ถูกบล็อกจะแสดงในสรุป เพื่อเพิ่มเข้า allow-list ได้ (--allow-host)"""
+    def __init__(self, allowed_hosts=DEFAULT_ALLOWED_HOSTS, allowed_types=("document", "xhr", "fetch", "script")):
+        self.allowed_hosts = tuple(allowed_hosts)
+        self.allowed_types = set(allowed_types)
+        self.allowed = Counter()
+        self.blocked = Counter()
+        self.blocked_hosts = Counter()   # host ของ request ประเภทที่อนุญาต แต่ถูกบล็อกเพราะไม่อยู่ใน allow-list
+        self.allowed_bytes = 0
+        self.blocked_bytes_estimate = 0
+
+    def is_allowed(self, url, resource_type):
+        if resource_type not in self.allowed_types:
+            return False
+        host = urlparse(url).hostname or ""
+        return any(host == h or host.endswith("." + h) for h in self.allowed_hosts)
+
+    async def handle(self, route):
+        request = route.request
+        if self.is_allowed(request.url, request.resource_type):
+            self.allowed[request.resource_type] += 1
+            await route.continue_()
+        else:
+            self.blocked[request.resource_type] += 1
+            self.blocked_bytes_estimate += BLOCKED_SIZE_ESTIMATES.get(request.resource_type, DEFAULT_BLOCKED_SIZE)
+            if request.resource_type in self.allowed_types:
+                self.blocked_hosts[urlparse(request.url).hostname or ""] += 1
+            await route.abort()
+
+    def on_response(self, response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.allowed_bytes += int(length)
+
+    async def attach(self, context):
+        await context.route("**/*", self.handle)
+        context.on("response", self.on_response)
+
+    def stats(self):
+        """ตัวนับสะสมของ filter (filter ของ BrowserPool ใช้ข้ามหลายรอบ ผู้เรียกจึงนำไปหาผลต่างของแต่ละรอบ)"""
+        return {
+            "requests_loaded": sum(self.allowed.values()),
+            "requests_blocked": sum(self.blocked.values()),
+            "bytes_loaded": self.allowed_bytes,
+            "bytes_blocked_estimate": self.blocked_bytes_estimate,
+        }
+
+    def print_summary(self):
+        total_blocked = sum(self.blocked.values())
+        print(f"🛡️ Request ที่โหลด: {sum(self.allowed.values())} ({self.allowed_bytes / 1024:,.0f} KB) | "
+              f"ที่บล็อก: {total_blocked} (ประหยัดได้ราว {self.blocked_bytes_estimate / 1024:,.0f} KB)")
+        for resource_type, count in self.blocked.most_common():
+            print(f"  - {resource_type}: {count}")
+        for host, count in self.blocked_hosts.most_common(5):
+            print(f"  ⚠️ XHR/script จาก host ที่ไม่อยู่ใน allow-list: {host} ({count})")
 
 class MyTCASScraper:
-    def __init__(self, base_url="https://course.mytcas.com"):
+    def __init__(self, base_url="https://course.mytcas.com", concurrency=3, rate=1.0, burst=1,
+                 use_http=True, http_timeout=15, http_miss_limit=HTTP_MISS_LIMIT,
+                 search_api_url=None, search_snapshot_dir=None,
+                 search_snapshot_max_age=24 * 3600,
+                 store=None, resume_max_age=None, goto_timeout=30000, selector_timeout=10000,
+                 request_filter=None, history=None, output_prefix="mytcas_scraped",
+                 output_formats=("csv", "jsonl", "xlsx"), keep_records=False, keep_raw_text=False,
+                 retries=3, backoff_base=1.0, backoff_max=30.0):
         self.base_url = base_url
+        self.concurrency = max(1, concurrency)  # จำนวนหน้า browser ที่ดึงรายละเอียดพร้อมกัน
+        self.rate_limiter = RateLimiter(rate, burst)
+        # ลองใหม่เมื่อล้มเหลวชั่วคราว และลดความถี่รวมเมื่อเซิร์ฟเวอร์เริ่มปฏิเสธ request
+        self.retry_policy = RetryPolicy(retries, backoff_base, backoff_max)
+        self.breaker = CircuitBreaker(self.rate_limiter)
+        self.failures = FailureReport()
+        self.use_http = use_http                # ลองดึงรายละเอียดด้วย HTTP ก่อนเปิด Chromium
+        self.http_timeout = http_timeout
+        # หน้าเว็บที่ render ฝั่ง client ทำให้ HTTP ไม่ได้ข้อมูลเลย และเสีย token ของ RateLimiter อีกหนึ่ง request
+        # ต่อหลักสูตร จึงปิด HTTP เมื่อไม่ได้ข้อมูลติดต่อกัน http_miss_limit ครั้ง (None = ไม่ปิด)
+        self.http_miss_limit = http_miss_limit
+        self._http_misses = 0
+        self.http_session = None
+        # URL ของ endpoint ค้นหา โดยมี {keyword} แทนคำค้น; หากไม่ระบุจะเรียนรู้จาก XHR ตอนค้นหาผ่านหน้าเว็บ
+        self.search_api_url = search_api_url
+        self.search_snapshot_dir = search_snapshot_dir  # โฟลเดอร์เก็บ/อ่าน JSON ผลการค้นหาที่บันทึกไว้
+        self.search_snapshot_max_age = search_snapshot_max_age  # วินาที: snapshot ที่เก่ากว่านี้ถูกดึงใหม่ (None = ไม่หมดอายุ)
+        self.store = store                      # ProgramStore สำหรับบันทึกผลทันทีและ resume
+        self.history = history                  # HistoryStore สะสมผลทุกรอบไว้ดูแนวโน้มค่าเล่าเรียน
+        self.resume_max_age = resume_max_age    # วินาที: ข้าม URL ที่ดึงมาแล้วภายในช่วงเวลานี้
+        self.goto_timeout = goto_timeout        # ms ต่อการโหลดหน้า
+        self.selector_timeout = selector_timeout  # ms ต่อการรอ element ที่ต้องการ
+        self.timing = TimingProfile()
+        # กรอง request ของ browser; ส่ง RequestFilter ที่ตั้งค่าเองได้ หรือ False เพื่อโหลดทุกอย่าง
+        if request_filter is None:
+            host = urlparse(base_url).hostname or "mytcas.com"
+            request_filter = RequestFilter(allowed_hosts=DEFAULT_ALLOWED_HOSTS if host.endswith("mytcas.com") else (host,))
+        self.request_filter = request_filter or None
+        # ผลลัพธ์ถูกเขียนลงไฟล์ทันทีที่ได้แต่ละหลักสูตร (RecordWriter) ไม่ต้องเก็บทั้งหมดไว้ในหน่วยความจำ
+        self.output_prefix = output_prefix
+        self.output_formats = tuple(output_formats)
+        self.writer = None
+        self.collected_count = 0
+        # reorder buffer: ผลที่ดึงเสร็จก่อนถึงลำดับของตัวเอง (ตำแหน่งในผลการค้นหา -> details หรือ None เมื่อล้มเหลว)
+        self._pending = {}
+        self._next_index = 0
+        self._history_rows = []                 # แถวที่รอเพิ่มเข้าประวัติ (ส่งเป็นชุดละ HISTORY_BATCH แถว)
+        self.history_added = 0
+        self.dedup_stats = {}
+        self.keep_records = keep_records        # True: เก็บผลใน collected_data ด้วย (เป็น ProgramDetails)
         self.collected_data = []
+        self.keep_raw_text = keep_raw_text      # True: เก็บข้อความดิบของผลค้นหาแบบบีบอัดไว้ใน ProgramRecord
 
-    async def perform_search(self, page, keyword):
-        """ค้นหาและเก็บข้อมูลรายการหลักสูตรจากคำค้น"""
+    async def _throttle(self):
+        with self.timing.step("rate_limit_wait"):
+            await self.rate_limiter.acquire()
+
+    async def _wait_for_any(self, page, selectors):
+        """รอจนกว่า selector ใด selector หนึ่งจะปรากฏ คืน False เมื่อหมดเวลา (ไม่ใช่ error)"""
         try:
-            print(f"\n🔎 Searching for keyword: '{keyword}'")
-            await page.goto(self.base_url, wait_until='networkidle')
-            await asyncio.sleep(2)
-
-            # หาช่องค้นหาแบบเจาะจง โดยลองหลาย selectors เผื่อหน้าเว็บเปลี่ยนแปลง
-            search_input = None
-            possible_selectors = [
-                "input[placeholder='พิมพ์ชื่อมหาวิทยาลัย คณะ หรือหลักสูตร']",
-                "input[type='search']",
-                "input.search-input",
-                "input[aria-label*='ค้นหา']",
-            ]
-            for sel in possible_selectors:
-                try:
-                    search_input = await page.query_selector(sel)
-                    if search_input:
-                        print(f"  ✔️ Found search input by selector: {sel}")
-                        break
-                except:
+            await page.wait_for_selector(", ".join(selectors), timeout=self.selector_timeout)
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
+    def _get_http_session(self):
+        """requests.Session ที่ใช้ร่วมกันทุก worker (connection pool ขนาดเท่ากับ concurrency)"""
+        if self.http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "th-TH,th;q=0.9"})
+            self.http_session = session
+        return self.http_session
+
+    def _new_details(self, program):
+        return {
+            "keyword": program.keyword,
+            "program_name": program.program_name,
+            "faculty": program.faculty,
+            "university": program.university,
+            "program_type": NOT_FOUND,
+            "tuition_fee": NOT_FOUND,
+            "url": program.url,
+            "scrape_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "keywords": program.keywords,
+        }
+
+    def _details_from_store(self, program, stored, keep_scrape_time=False):
+        details = self._new_details(program)
+        details["program_type"] = stored["program_type"]
+        details["tuition_fee"] = stored["tuition_fee"]
+        if keep_scrape_time:
+            details["scrape_time"] = stored["scrape_time"]
+        return details
+
+    def _snapshot_path(self, keyword):
+        name = re.sub(r'[\\/:*?"<>|\s]+', '_', keyword.strip())
+        return os.path.join(self.search_snapshot_dir, f"search_{name}.json")
+
+    def _read_snapshot(self, path, keyword):
+        """อ่าน snapshot ผลการค้นหา คืน None หากเป็นของคำค้นอื่น (ชื่อไฟล์ชนกัน) ได้มาจาก endpoint อื่น
+        หรือเก่ากว่า search_snapshot_max_age"""
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if not isinstance(snapshot, dict) or "data" not in snapshot or snapshot.get("keyword") != keyword:
+            return None
+        if self.search_api_url and snapshot.get("endpoint") != self.search_api_url:
+            return None
+        if self.search_snapshot_max_age is not None and \
+                time.time() - snapshot.get("saved_at", 0) > self.search_snapshot_max_age:
+            return None
+        return snapshot["data"]
+
+    def _programs_from_json(self, data, keyword):
+        """แปลง JSON ผลการค้นหาให้อยู่ในรูปแบบเดียวกับผลจาก DOM"""
+        records = _find_record_list(data) or []
+        programs = []
+        for record in records:
+            if not _is_program_record(record):
+                continue
+            url = _first_value(record, API_URL_KEYS)
+            if not url:
+                program_id = _first_value(record, API_ID_KEYS)
+                if not program_id:
+                    continue
+                url = f"/programs/{program_id}"
+            programs.append(ProgramRecord(
+                keyword=keyword,
+                program_name=_first_value(record, API_NAME_KEYS),
+                faculty=_first_value(record, API_FACULTY_KEYS).replace('›', ' > '),
+                university=_first_value(record, API_UNIVERSITY_KEYS),
+                url=url if url.startswith("http") else self.base_url + url,
+            ))
+        return programs
+
+    async def search_programs_api(self, keyword):
+        """ค้นหาผ่าน JSON endpoint (หรือ snapshot ที่บันทึกไว้) คืน None หากใช้ไม่ได้"""
+        snapshot = self._snapshot_path(keyword) if self.search_snapshot_dir else None
+        data = self._read_snapshot(snapshot, keyword) if snapshot and os.path.exists(snapshot) else None
+        if data is not None:
+            print(f"  📦 ใช้ snapshot ผลการค้นหา: {snapshot}")
+        elif self.search_api_url:
+            session = self._get_http_session()
+            url = self.search_api_url.format(keyword=quote(keyword))
+            await self._throttle()
+            loop = asyncio.get_running_loop()
+            with self.timing.step("search_api"):
+                resp = await loop.run_in_executor(
+                    None, functools.partial(session.get, url, timeout=self.http_timeout)
+                )
+            resp.raise_for_status()
+            data = resp.json()
+            if snapshot:
+                os.makedirs(self.search_snapshot_dir, exist_ok=True)
+                with open(snapshot, "w", encoding="utf-8") as f:
+                    json.dump({"keyword": keyword, "endpoint": self.search_api_url, "saved_at": time.time(),
+                               "data": data}, f, ensure_ascii=False)
+        else:
+            return None
+
+        programs = self._programs_from_json(data, keyword)
+        return programs or None
+
+    def _watch_search_responses(self, page, keyword):
+        """เก็บ response แบบ JSON ที่มีคำค้นอยู่ใน URL เพื่อใช้ค้นหาครั้งถัดไปโดยไม่ต้องเปิดหน้าเว็บ
+        endpoint จะถูกจดจำเฉพาะเมื่อเนื้อหาของ response มีรูปแบบเป็นรายการหลักสูตร"""
+        encoded = quote(keyword)
+        candidates = []
+
+        def on_response(response):
+            content_type = response.headers.get("content-type", "")
+            if "json" in content_type and (encoded in response.url or keyword in response.url):
+                candidates.append(response)
+
+        page.on("response", on_response)
+
+        async def finish():
+            page.remove_listener("response", on_response)
+            for response in candidates:
+                template = response.url.replace(encoded, "{keyword}").replace(keyword, "{keyword}")
+                if "{keyword}" not in template:
                     continue
-            if not search_input:
-                print("  ❌ ไม่พบช่องค้นหาในหน้าเว็บ")
-                return []
-
-            # ล้างค่าเดิมแล้วกรอกคำค้นหา
-            await search_input.fill("")
-            await asyncio.sleep(0.5)
-            await search_input.fill(keyword)
-            await search_input.press("Enter")
-            await asyncio.sleep(3)
-
-            # ดึงรายการผลลัพธ์ (ลองหลาย selector)
-            program_list = []
-            result_selectors = [
-                "ul.t-programs > li",
-                "ul.program-list > li",
-                "div.search-results > ul > li",
-                "[data-testid='program-item']",
-            ]
-            for sel in result_selectors:
                 try:
-                    items = await page.query_selector_all(sel)
-                    if items and len(items) > 0:
-                        print(f"  ✔️ พบ {len(items)} ผลลัพธ์โดยใช้ selector: {sel}")
-                        program_list = items
-                        break
-                except:
+                    data = await response.json()
+                except Exception:
                     continue
-            if not program_list:
-                print("  ❌ ไม่พบผลลัพธ์จากการค้นหา")
-                return []
+                if self._programs_from_json(data, keyword):
+                    print(f"  🛰️ พบ search endpoint: {template}")
+                    return template
+            return None
 
-            programs = []
-            for idx, item in enumerate(program_list):
-                try:
-                    text = await item.inner_text()
-                    link_el = await item.query_selector("a")
-                    if not link_el:
-                        continue
-                    href = await link_el.get_attribute("href")
-                    full_url = href if href.startswith("http") else self.base_url + href
-
-                    lines = [line.strip() for line in text.splitlines() if line.strip()]
-                    program_name = lines[0] if len(lines) > 0 else ""
-                    faculty = lines[1].replace('›', ' > ') if len(lines) > 1 else ""
-                    university = lines[2] if len(lines) > 2 else ""
-
-                    programs.append({
-                        "keyword": keyword,
-                        "program_name": program_name,
-                        "faculty": faculty,
-                        "university": university,
-                        "url": full_url,
-                        "raw_text": text
-                    })
-                    print(f"  {idx+1}. {program_name[:50]}...")
-
-                except Exception as e:
-                    print(f"  ⚠️ Error processing item #{idx+1}: {e}")
-
-            return programs
+        return finish
 
+    async def perform_search(self, page, keyword):
+        """ค้นหาและเก็บข้อมูลรายการหลักสูตรจากคำค้น"""
+        print(f"\n🔎 Searching for keyword: '{keyword}'")
+        try:
+            programs = await self.search_programs_api(keyword)
+            if programs:
+                print(f"  ✔️ พบ {len(programs)} ผลลัพธ์จาก search endpoint")
+                return programs
         except Exception as e:
-            print(f"❌ Error during searching '{keyword}': {e}")
-            return []
+            print(f"  ↪️ search endpoint ใช้ไม่ได้ ({e}) ค้นหาผ่านหน้าเว็บแทน")
 
-    async def fetch_program_details(self, page, program):
-        """เปิดหน้ารายละเอียดหลักสูตร และดึงข้อมูล ค่าใช้จ่าย และประเภทหลักสูตร"""
-        try:
-            print(f"📄 Fetching details for: {program['program_name'][:50]}...")
-            await page.goto(program["url"], wait_until="networkidle")
-            await asyncio.sleep(2)
-
-            details = {
-                "keyword": program["keyword"],
-                "program_name": program["program_name"],
-                "faculty": program["faculty"],
-                "university": program["university"],
-                "program_type": "ไม่พบข้อมูล",
-                "tuition_fee": "ไม่พบข้อมูล",
-                "url": program["url"],
-                "scrape_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-
-            # Selector ที่จะใช้ดึงข้อมูลรายละเอียดที่สนใจ
-            type_selectors = [
-                "dt:has-text('ประเภทหลักสูตร') + dd",
-                ".program-type",
-                "[data-field='program_type']",
-                "td:has-text('ประเภทหลักสูตร') + td"
-            ]
-            fee_selectors = [
-                "dt:has-text('ค่าใช้จ่าย') + dd",
-                "dt:has-text('ค่าธรรมเนียม') + dd",
-                ".fee-info",
-                ".tuition-fee",
-                "[data-field='fee']",
-                "td:has-text('ค่าใช้จ่าย') + td"
-            ]
-
-            for sel in type_selectors:
-                el = await page.query_selector(sel)
-                if el:
-                    txt = (await el.inner_text()).strip()
-                    if txt:
-                        details["program_type"] = txt
-                        break
-
-            for sel in fee_selectors:
-                el = await page.query_selector(sel)
-                if el:
-                    txt = (await el.inner_text()).strip()
-                    if txt:
-                        details["tuition_fee"] = txt
-                        break
-
-            # หากยังไม่มีข้อมูล ให้ลองดึงจากตาราง
+        async def search_dom():
+            finish_watch = self._watch_search_responses(page, keyword) if not self.search_api_url else None
+            try:
+                return await self._perform_search_dom(page, keyword)
+            finally:
+                if finish_watch:
+                    self.search_api_url = await finish_watch()
+
+        programs = await self._with_retries("search", keyword, search_dom)
+        return programs or []
+
+    async def _with_retries(self, stage, target, attempt_fn):
+        """เรียก attempt_fn ซ้ำตาม RetryPolicy เมื่อความล้มเหลวเป็นประเภทที่ลองใหม่ได้
+        ทุกผลลัพธ์ถูกส่งให้ CircuitBreaker และความล้มเหลวถูกบันทึกใน FailureReport
+        คืนผลลัพธ์ หรือข้อมูลบางส่วน (ScrapeError.partial) หรือ None เมื่อล้มเหลวถาวร"""
+        attempt = 0
+        kind = None
+        while True:
+            try:
+                result = await attempt_fn()
+            except Exception as e:
+                kind, retry_after = classify_error(e)
+                self.breaker.record(False, kind)
+                attempt += 1
+                if kind in RETRYABLE_KINDS and attempt <= self.retry_policy.retries:
+                    delay = self.retry_policy.delay(attempt - 1, retry_after)
+                    print(f"   🔁 {stage} ล้มเหลว ({kind}: {str(e)[:80]}) ลองใหม่ครั้งที่ {attempt} ใน {delay:.1f} วินาที")
+                    with self.timing.step("retry_backoff"):
+                        await asyncio.sleep(delay)
+                    continue
+                partial = getattr(e, "partial", None)
+                self.failures.add(stage, target, kind, attempt, "partial" if partial else "failed", e)
+                print(f"   ❌ {stage} ล้มเหลว ({kind}) หลังพยายาม {attempt} ครั้ง: {str(e)[:120]}")
+                return partial
+            self.breaker.record(True)
+            if attempt:
+                self.failures.add(stage, target, kind, attempt + 1, "recovered")
+            return result
+
+    async def _perform_search_dom(self, page, keyword):
+        """ค้นหาผ่านช่องค้นหาในหน้าเว็บ แล้วอ่านรายการหลักสูตรจาก DOM"""
+        await self._throttle()
+        with self.timing.step("search_goto"):
+            response = await page.goto(self.base_url, wait_until='domcontentloaded', timeout=self.goto_timeout)
+        check_status(response.status if response else None, response.headers if response else None)
+
+        # หาช่องค้นหาแบบเจาะจง โดยลองหลาย selectors เผื่อหน้าเว็บเปลี่ยนแปลง
+        search_input = None
+        possible_selectors = [
+            "input[placeholder='พิมพ์ชื่อมหาวิทยาลัย คณะ หรือหลักสูตร']",
+            "input[type='search']",
+            "input.search-input",
+            "input[aria-label*='ค้นหา']",
+        ]
+        with self.timing.step("search_input_probe"):
+            await self._wait_for_any(page, possible_selectors)
+        for sel in possible_selectors:
             try:
-                rows = await page.query_selector_all("table tr")
-                for row in rows:
-                    cells = await row.query_selector_all("td, th")
-                    if len(cells) >= 2:
-                        header = (await cells[0].inner_text()).strip()
-                        value = (await cells[1].inner_text()).strip()
-
-                        if "ประเภท" in header and details["program_type"] == "ไม่พบข้อมูล":
-                            details["program_type"] = value
-                        if any(w in header for w in ["ค่าใช้จ่าย", "ธรรมเนียม", "ค่าเรียน"]) and details["tuition_fee"] == "ไม่พบข้อมูล":
-                            details["tuition_fee"] = value
+                search_input = await page.query_selector(sel)
+                if search_input:
+                    print(f"  ✔️ Found search input by selector: {sel}")
+                    break
             except:
-                pass
+                continue
+        if not search_input:
+            raise ScrapeError("selector_miss", "ไม่พบช่องค้นหาในหน้าเว็บ")
 
-            print(f"   ✔️ {details['university'][:30]} - {details['tuition_fee'][:30]}")
-            return details
+        # ล้างค่าเดิมแล้วกรอกคำค้นหา
+        await search_input.fill("")
+        await search_input.fill(keyword)
+        await search_input.press("Enter")
 
-        except Exception as e:
-            print(f"   ❌ Failed to fetch details: {e}")
+        # ดึงรายการผลลัพธ์ (ลองหลาย selector) หลังจากผลลัพธ์แสดงบนหน้าเว็บแล้ว
+        program_list = []
+        result_selectors = [
+            "ul.t-programs > li",
+            "ul.program-list > li",
+            "div.search-results > ul > li",
+            "[data-testid='program-item']",
+        ]
+        with self.timing.step("search_results_wait"):
+            await self._wait_for_any(page, result_selectors)
+
+        # อ่านรายการผลลัพธ์ทั้งหมดด้วย page.evaluate ครั้งเดียว แทนการเรียก inner_text ทีละรายการ
+        with self.timing.step("search_extract"):
+            found = await page.evaluate(EXTRACT_RESULTS_JS, result_selectors)
+        if found:
+            print(f"  ✔️ พบ {len(found['items'])} ผลลัพธ์โดยใช้ selector: {found['selector']}")
+            program_list = found["items"]
+        if not program_list:
+            print("  ❌ ไม่พบผลลัพธ์จากการค้นหา")
+            return []
+
+        programs = []
+        for idx, item in enumerate(program_list):
+            try:
+                text = item["text"]
+                href = item["href"]
+                if not href:
+                    continue
+                full_url = href if href.startswith("http") else self.base_url + href
+
+                lines = [line.strip() for line in text.splitlines() if line.strip()]
+                program_name = lines[0] if len(lines) > 0 else ""
+                faculty = lines[1].replace('›', ' > ') if len(lines) > 1 else ""
+                university = lines[2] if len(lines) > 2 else ""
+
+                programs.append(ProgramRecord(
+                    keyword=keyword,
+                    program_name=program_name,
+                    faculty=faculty,
+                    university=university,
+                    url=full_url,
+                    raw_text=text,
+                    keep_raw_text=self.keep_raw_text,
+                ))
+                print(f"  {idx+1}. {program_name[:50]}...")
+
+            except Exception as e:
+                print(f"  ⚠️ Error processing item #{idx+1}: {e}")
+
+        return programs
+
+    async def fetch_program_details_http(self, program):
+        """ดึงรายละเอียดจาก HTML แบบ static ผ่าน requests คืน None หากหน้าเว็บไม่มีข้อมูลครบ"""
+        session = self._get_http_session()
+        stored = self.store.get(program.url) if self.store else None
+
+        # ส่ง validator เดิมไปด้วย เพื่อให้เซิร์ฟเวอร์ตอบ 304 หากหน้าไม่เปลี่ยน
+        headers = {}
+        if stored and stored["etag"]:
+            headers["If-None-Match"] = stored["etag"]
+        if stored and stored["last_modified"]:
+            headers["If-Modified-Since"] = stored["last_modified"]
+
+        await self._throttle()
+        loop = asyncio.get_running_loop()
+        with self.timing.step("http_fetch"):
+            resp = await loop.run_in_executor(
+                None, functools.partial(session.get, program.url, headers=headers, timeout=self.http_timeout)
+            )
+        if resp.status_code == 304 and stored:
+            self.store.touch(program.url)
+            return self._details_from_store(program, stored)
+        resp.raise_for_status()
+
+        content_hash = hashlib.sha1(resp.content).hexdigest()
+        if stored and stored["content_hash"] == content_hash:
+            self.store.touch(program.url)
+            return self._details_from_store(program, stored)
+
+        with self.timing.step("http_parse"):
+            fields = parse_program_html(resp.text)
+        if NOT_FOUND in fields.values():
             return None
+        details = self._new_details(program)
+        details.update(fields)
+        if self.store:
+            self.store.save(details, etag=resp.headers.get("ETag"),
+                            last_modified=resp.headers.get("Last-Modified"), content_hash=content_hash)
+        return details
+
+    def _http_result(self, hit):
+        """นับผลของการดึงด้วย HTTP (http_hit/http_miss ใน TimingProfile) และปิด HTTP เมื่อพลาดติดต่อกันครบ http_miss_limit"""
+        self.timing.count("http_hit" if hit else "http_miss")
+        self._http_misses = 0 if hit else self._http_misses + 1
+        if self.use_http and self.http_miss_limit and self._http_misses >= self.http_miss_limit:
+            self.use_http = False
+            print(f"ℹ️ HTTP ไม่ได้ข้อมูลติดต่อกัน {self._http_misses} หลักสูตร ใช้ Playwright อย่างเดียวจนจบการรัน")
+
+    async def fetch_program_details(self, page, program):
+        """เปิดหน้ารายละเอียดหลักสูตร และดึงข้อมูล ค่าใช้จ่าย และประเภทหลักสูตร (ลองใหม่ตาม RetryPolicy)"""
+        print(f"📄 Fetching details for: {program.program_name[:50]}...")
+        return await self._with_retries("detail", program.url, lambda: self._fetch_details_once(page, program))
+
+    async def _fetch_details_once(self, page, program):
+        """ดึงรายละเอียดหนึ่งครั้ง: HTTP ก่อน (ถ้าเปิดใช้) แล้วจึง Playwright; error ถูกส่งต่อให้ _with_retries"""
+        if self.use_http:
+            try:
+                details = await self.fetch_program_details_http(program)
+                if details:
+                    self._http_result(True)
+                    print(f"   ✔️ (HTTP) {details['university'][:30]} - {details['tuition_fee'][:30]}")
+                    return details
+                self._http_result(False)
+                print("   ↪️ HTML ไม่มีข้อมูลครบ ใช้ Playwright แทน")
+            except Exception as e:
+                # ถูกจำกัดความถี่หรือเซิร์ฟเวอร์มีปัญหา: เปิด browser ก็เจอเซิร์ฟเวอร์เดียวกัน ให้ถอยแล้วลองใหม่
+                if classify_error(e)[0] in THROTTLE_KINDS:
+                    raise
+                self._http_result(False)
+                print(f"   ↪️ HTTP fetch ล้มเหลว ({e}) ใช้ Playwright แทน")
+
+        await self._throttle()
+        with self.timing.step("goto"):
+            response = await page.goto(program.url, wait_until="domcontentloaded", timeout=self.goto_timeout)
+        check_status(response.status if response else None, response.headers if response else None)
+
+        details = self._new_details(program)
+
+        # รอจนข้อมูลที่ต้องการแสดง แทนการหน่วงเวลาคงที่
+        with self.timing.step("selector_probe"):
+            found = await self._wait_for_any(page, DETAIL_WAIT_SELECTORS)
 
-    async def scrape(self, keywords):
-        """จัดการรันกระบวนการสครัปทั้งหมด"""
-        results = []
+        with self.timing.step("extraction"):
+            extracted = await page.evaluate(EXTRACT_DETAILS_JS, {
+                "program_type": DETAIL_TYPE_CANDIDATES,
+                "tuition_fee": DETAIL_FEE_CANDIDATES,
+            })
+        for key in ("program_type", "tuition_fee"):
+            if extracted[key]:
+                details[key] = extracted[key]
+        # หากยังไม่มีข้อมูล ให้ลองดึงจากตาราง
+        _apply_table_rows(details, extracted["rows"])
+
+        # หน้าโหลดไม่ครบ (ไม่พบทั้ง selector และข้อมูล): ลองใหม่ หากยังไม่ได้จะเขียนข้อมูลเท่าที่มีลงไฟล์ผลลัพธ์
+        # แต่ไม่บันทึกลง store เพื่อให้ --resume ดึงหลักสูตรนี้ใหม่ในรอบถัดไป
+        if not found and details["program_type"] == NOT_FOUND and details["tuition_fee"] == NOT_FOUND:
+            raise ScrapeError("selector_miss", "ไม่พบข้อมูลประเภทหลักสูตรและค่าใช้จ่ายในหน้า", partial=details)
+        if self.store:
+            self.store.save(details)
+        print(f"   ✔️ {details['university'][:30]} - {details['tuition_fee'][:30]}")
+        return details
+
+    def _open_writer(self):
+        if self.writer is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.writer = RecordWriter(f"{self.output_prefix}_{timestamp}", self.output_formats)
+            print(f"📝 เขียนผลลัพธ์ระหว่างการรันไปที่: {', '.join(self.writer.paths.values())}")
+        return self.writer
+
+    def _emit(self, details):
+        """ส่งรายละเอียดหลักสูตรหนึ่งรายการออกไฟล์ทันที (หนึ่งแถวต่อคำค้นที่พบหลักสูตรนี้) และเข้าประวัติ"""
+        writer = self._open_writer()
+        keywords = details.get("keywords") or (details["keyword"],)
+        for kw in keywords:
+            record = {**details, "keyword": kw, "keywords": " | ".join(keywords)}
+            writer.write(record)
+            self.collected_count += 1
+            if self.history is not None:
+                self._history_rows.append(record)
+        if len(self._history_rows) >= HISTORY_BATCH:
+            self._flush_history()
+        if self.keep_records:
+            self.collected_data.append(ProgramDetails.from_dict(details))
+
+    def _flush_history(self):
+        if self._history_rows:
+            self.history_added += self.history.append(self._history_rows)
+            self._history_rows = []
+
+    def _complete(self, idx, details):
+        """รับผลของหลักสูตรลำดับ idx (None = ล้มเหลว) แล้วเขียนผลที่ต่อเนื่องกันตามลำดับผลการค้นหา
+        ผลที่เสร็จก่อนลำดับของตัวเองรออยู่ใน buffer ไม่เกินจำนวนที่ดึงพร้อมกันอยู่โดยประมาณ"""
+        self._pending[idx] = details
+        while self._next_index in self._pending:
+            ready = self._pending.pop(self._next_index)
+            self._next_index += 1
+            if ready:
+                self._emit(ready)
+
+    async def _detail_worker(self, pool, queue, total):
+        """ดึงรายละเอียดหลักสูตรจากคิวไปเรื่อย ๆ จนกว่าคิวจะว่าง (ยืมหน้าจาก pool ทีละหลักสูตร)"""
+        while True:
+            try:
+                idx, program = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            details = None
+            try:
+                print(f"[{idx+1}/{total}] Processing program...")
+                async with pool.page() as page:
+                    details = await self.fetch_program_details(page, program)
+            finally:
+                self._complete(idx, details)
+                queue.task_done()
+
+    def new_browser_pool(self, recycle_after=None):
+        """BrowserPool ที่ตั้งค่าตาม scraper นี้ (จำนวนหน้า, locale/user agent, RequestFilter)"""
+        return BrowserPool(
+            size=self.concurrency,
+            recycle_after=recycle_after,
+            headless=True,  # เปลี่ยนเป็น False หากต้องการเห็น browser
+            context_options={"locale": "th-TH", "user_agent": USER_AGENT},
+            request_filter=self.request_filter,
+        )
+
+    async def scrape(self, keywords, pool=None):
+        """จัดการรันกระบวนการสครัปทั้งหมด
+        ส่ง pool (BrowserPool ที่เปิดไว้แล้ว) เพื่อใช้ browser เดิมข้ามหลายรอบ ไม่เช่นนั้นจะเปิดและปิด browser ในรอบนี้"""
         print("🚀 Starting scraping process...")
+        self._open_writer()
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)  # เปลี่ยนเป็น False หากต้องการเห็น browser
-            context = await browser.new_context(
-                locale="th-TH",
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
-            )
-            page = await context.new_page()
+        own_pool = pool is None
+        if own_pool:
+            pool = self.new_browser_pool()
+            await pool.start()
+        else:
+            # สถิติการกรอง request มาจาก filter ที่ติดตั้งกับ context ของ pool
+            self.request_filter = pool.request_filter
+
+        filter_before = self.request_filter.stats() if self.request_filter else {}
+        try:
+            await self._scrape_with_pool(keywords, pool)
+        finally:
+            if own_pool:
+                await pool.close()
+        # request/bytes ที่โหลดและที่บล็อกในรอบนี้ บันทึกไว้ในสรุปเวลา (และไฟล์ _timing.csv)
+        if self.request_filter:
+            for name, value in self.request_filter.stats().items():
+                self.timing.count(name, value - filter_before[name])
 
+        if self.http_session is not None:
+            self.http_session.close()
+            self.http_session = None
+
+        print(f"✅ เสร็จสิ้นการดึงข้อมูลทั้งหมด จำนวนหลักสูตร: {self.collected_count}")
+        self.timing.print_summary()
+        if self.request_filter:
+            self.request_filter.print_summary()
+        self.failures.print_summary()
+        return self.collected_data
+
+    async def _scrape_with_pool(self, keywords, pool):
+        # ค้นหาทุกคำค้นก่อน แล้วรวมหลักสูตรไว้ในลำดับเดียวกับผลการค้นหา
+        all_programs = []
+        async with pool.page() as page:
             for kw in keywords:
                 programs = await self.perform_search(page, kw)
                 if not programs:
                     print(f"❌ ไม่พบหลักสูตรสำหรับคำค้น '{kw}'")
                     continue
+                all_programs.extend(programs)
 
-                for idx, program in enumerate(programs, 1):
-                    print(f"[{idx}/{len(programs)}] Processing program...")
-                    detail = await self.fetch_program_details(page, program)
-                    if detail:
-                        self.collected_data.append(detail)
-                    await asyncio.sleep(1.2)  # หน่วงเวลาเพื่อป้องกันการโดนบล็อค
+        # หลักสูตรเดียวกันอาจถูกพบจากหลายคำค้น: ดึงรายละเอียดครั้งเดียวต่อ URL แล้วเขียนแถวให้ทุกคำค้น
+        search_results = len(all_programs)
+        all_programs, duplicates = dedupe_programs(all_programs)
+        self.dedup_stats = {
+            "search_results": search_results,
+            "unique_programs": len(all_programs),
+            "fetches_avoided": duplicates,
+        }
+        if duplicates:
+            print(f"🔁 พบหลักสูตรซ้ำข้ามคำค้น {duplicates} รายการ: ดึงรายละเอียด {len(all_programs)} URL "
+                  f"จากผลการค้นหา {search_results} รายการ")
 
-            await browser.close()
+        # ดึงรายละเอียดด้วย pool ของหน้า browser โดยมี RateLimiter คุมความถี่ของ request
+        # ผลถูกเขียนตามลำดับผลการค้นหาเสมอ (reorder buffer ใน _complete) ไฟล์ของแต่ละรอบ/shard จึงเทียบกันได้
+        self._pending = {}
+        self._next_index = 0
+        queue = asyncio.Queue()
+        skipped = 0
+        for idx, program in enumerate(all_programs):
+            # โหมด resume: ใช้ข้อมูลใน store หาก URL นี้ถูกดึงมาแล้วภายในช่วงเวลาที่กำหนด
+            if self.store and self.resume_max_age is not None and self.store.is_fresh(program.url, self.resume_max_age):
+                self._complete(idx, self._details_from_store(program, self.store.get(program.url), keep_scrape_time=True))
+                skipped += 1
+                continue
+            queue.put_nowait((idx, program))
+        if skipped:
+            print(f"⏭️ ข้าม {skipped} หลักสูตรที่ดึงมาแล้ว (resume)")
 
-        print(f"✅ เสร็จสิ้นการดึงข้อมูลทั้งหมด จำนวนหลักสูตร: {len(self.collected_data)}")
-        return self.collected_data
+        n_workers = max(1, min(self.concurrency, pool.size, queue.qsize()))
+        await asyncio.gather(*(
+            self._detail_worker(pool, queue, len(all_programs)) for _ in range(n_workers)
+        ))
 
-    def save_data(self, filename_prefix="mytcas_scraped"):
-        if not self.collected_data:
+    def save_data(self):
+        """ปิดไฟล์ที่เขียนระหว่างการรัน (บันทึก xlsx) บันทึกสรุปเวลา และเพิ่มผลเข้าประวัติ คืน dict ของไฟล์"""
+        if self.writer is None:
             print("❌ ไม่มีข้อมูลให้บันทึก")
             return None
-        df = pd.DataFrame(self.collected_data)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        excel_file = f"{filename_prefix}_{timestamp}.xlsx"
-        csv_file = f"{filename_prefix}_{timestamp}.csv"
+        prefix = self.writer.prefix
+        paths = self.writer.close()
+        self.writer = None
+        if not self.collected_count:
+            print("⚠️ ไม่มีหลักสูตรที่ดึงได้ ไฟล์ผลลัพธ์มีเพียงหัวตาราง")
 
-        df.to_excel(excel_file, index=False, engine='openpyxl')
-        df.to_csv(csv_file, index=False, encoding="utf-8-sig")
+        labels = {"xlsx": "Excel", "csv": "CSV", "jsonl": "JSON Lines"}
+        for fmt, path in paths.items():
+            print(f"💾 บันทึกข้อมูลเป็นไฟล์ {labels.get(fmt, fmt)}: {path}")
 
-        print(f"💾 บันทึกข้อมูลสำเร็จเป็นไฟล์ Excel: {excel_file}")
-        print(f"💾 บันทึกข้อมูลสำรองเป็นไฟล์ CSV: {csv_file}")
-        return df
+        timing_rows = self.timing.summary() + self.timing.counter_rows()
+        if timing_rows:
+            timing_file = f"{prefix}_timing.csv"
+            pd.DataFrame(timing_rows).to_csv(timing_file, index=False, encoding="utf-8-sig")
+            print(f"⏱️ บันทึกสรุปเวลาแต่ละขั้นตอน: {timing_file}")
 
-async def main():
+        if self.failures.rows:
+            failure_file = f"{prefix}_failures.csv"
+            pd.DataFrame(self.failures.rows).to_csv(failure_file, index=False, encoding="utf-8-sig")
+            print(f"🧾 บันทึกรายการที่ล้มเหลว/ลองใหม่: {failure_file}")
+
+        # ประวัติถูกเพิ่มจากแถวที่เขียนระหว่างการรัน (ไม่ขึ้นกับรูปแบบไฟล์ผลลัพธ์) ส่งชุดที่เหลือตอนจบ
+        if self.history is not None and self.collected_count:
+            self._flush_history()
+            print(f"🗂️ เพิ่มเข้าประวัติค่าเล่าเรียน {self.history_added} แถว ({self.history.path})")
+        return paths
+
+def read_keywords(sources, inline=()):
+    """รวมคำค้นจากอาร์กิวเมนต์และไฟล์ (หนึ่งคำค้นต่อบรรทัด, '-' = stdin, บรรทัดที่ขึ้นต้นด้วย # คือคอมเมนต์)
+    ตัดคำซ้ำโดยคงลำดับที่พบครั้งแรก"""
+    keywords = list(inline)
+    for source in sources:
+        if source == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(source, encoding="utf-8-sig") as f:
+                lines = f.read().splitlines()
+        keywords.extend(line for line in lines if not line.lstrip().startswith("#"))
+    keywords = [kw.strip() for kw in keywords if kw.strip()]
+    return list(dict.fromkeys(keywords))
+
+def parse_shard(value):
+    """'i/n' (เริ่มนับที่ 1) -> (i, n)"""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"รูปแบบ shard ต้องเป็น i/n เช่น 1/4 (ได้รับ '{value}')")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard ต้องอยู่ในช่วง 1/{count} ถึง {count}/{count} (ได้รับ '{value}')")
+    return index, count
+
+def select_shard(keywords, shard):
+    """แบ่งคำค้นแบบ round-robin หลังเรียงลำดับ ทุกเครื่องที่ได้รายการคำค้นชุดเดียวกันจะได้ส่วนที่ไม่ทับกัน"""
+    if not shard:
+        return keywords
+    index, count = shard
+    return sorted(keywords)[index - 1::count]
+
+def merge_outputs(paths, prefix, formats=("csv", "xlsx")):
+    """รวมไฟล์ผลลัพธ์ (.csv/.jsonl) จากหลาย shard แบบ streaming ตัดแถวซ้ำตาม (keyword, url) โดยเก็บแถวแรกที่พบ"""
+    writer = RecordWriter(prefix, formats)
+    seen = set()
+    duplicates = 0
+    for path in paths:
+        with open(path, encoding="utf-8-sig") as f:
+            records = (json.loads(line) for line in f if line.strip()) if path.endswith(".jsonl") else csv.DictReader(f)
+            for record in records:
+                key = (record.get("keyword"), record.get("url"))
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                writer.write(record)
+        print(f"📥 รวม {path}")
+    out = writer.close()
+    print(f"✅ รวม {writer.count} แถวจาก {len(paths)} ไฟล์ (ตัดแถวซ้ำ {duplicates} แถว): {', '.join(out.values())}")
+    return out
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="ดึงข้อมูลหลักสูตรและค่าเล่าเรียนจาก MyTCAS (ไม่ระบุอาร์กิวเมนต์ = เมนูแบบโต้ตอบ)"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scrape = commands.add_parser("scrape", help="ดึงข้อมูลตามรายการคำค้น")
+    scrape.add_argument("keywords", nargs="*", help="คำค้น (ใส่เครื่องหมายคำพูดหากมีช่องว่าง)")
+    scrape.add_argument("-f", "--keywords-file", action="append", default=[], metavar="PATH",
+                        help="ไฟล์คำค้น หนึ่งคำต่อบรรทัด ใช้ '-' เพื่ออ่านจาก stdin (ระบุได้หลายครั้ง)")
+    scrape.add_argument("-o", "--out-dir", default=".", help="โฟลเดอร์สำหรับไฟล์ผลลัพธ์ (ค่าเริ่มต้น: โฟลเดอร์ปัจจุบัน)")
+    scrape.add_argument("--prefix", default="mytcas_scraped", help="คำนำหน้าชื่อไฟล์ผลลัพธ์")
+    scrape.add_argument("--formats", default="csv,jsonl,xlsx", help="รูปแบบไฟล์ผลลัพธ์ คั่นด้วย , (csv,jsonl,xlsx)")
+    scrape.add_argument("--shard", type=parse_shard, metavar="I/N", help="ดึงเฉพาะส่วนที่ I จาก N ส่วนของคำค้น")
+    scrape.add_argument("-c", "--concurrency", type=int, default=3, help="จำนวนหน้า browser ที่ดึงรายละเอียดพร้อมกัน")
+    scrape.add_argument("--rate", type=float, default=1.0, help="จำนวน request ต่อวินาทีโดยเฉลี่ย")
+    scrape.add_argument("--burst", type=int, default=1, help="จำนวน request ที่ส่งติดกันได้ก่อนถูกจำกัด")
+    scrape.add_argument("--retries", type=int, default=3, help="จำนวนครั้งที่ลองใหม่เมื่อล้มเหลวชั่วคราว")
+    scrape.add_argument("--resume-hours", type=float, metavar="HOURS",
+                        help="ข้ามหลักสูตรที่ดึงแล้วภายในจำนวนชั่วโมงนี้ (ใช้ข้อมูลจาก store)")
+    scrape.add_argument("--store", default="mytcas_store.sqlite3", help="ไฟล์ SQLite สำหรับบันทึกผลทันทีและ resume")
+    scrape.add_argument("--history", default="mytcas_history.sqlite3", help="ไฟล์ประวัติค่าเล่าเรียน")
+    scrape.add_argument("--no-history", action="store_true", help="ไม่เพิ่มผลรอบนี้เข้าประวัติค่าเล่าเรียน")
+    scrape.add_argument("--no-http", action="store_true", help="ดึงรายละเอียดด้วย Playwright อย่างเดียว")
+    scrape.add_argument("--allow-host", action="append", default=[], metavar="HOST",
+                        help="host เพิ่มเติมที่ browser โหลด XHR/script ได้ เช่น API หรือ CDN ของเว็บ (ระบุได้หลายครั้ง)")
+    scrape.add_argument("--search-snapshots", metavar="DIR", help="โฟลเดอร์เก็บ/อ่าน JSON ผลการค้นหา")
+    scrape.add_argument("--snapshot-hours", type=float, default=24, metavar="HOURS",
+                        help="ใช้ snapshot ผลการค้นหาที่บันทึกภายในจำนวนชั่วโมงนี้ (ค่าเริ่มต้น: 24)")
+
+    merge = commands.add_parser("merge", help="รวมไฟล์ผลลัพธ์ .csv/.jsonl จากหลาย shard")
+    merge.add_argument("inputs", nargs="+", help="ไฟล์ผลลัพธ์ที่ต้องการรวม")
+    merge.add_argument("-o", "--output", default="mytcas_scraped_merged", help="ชื่อไฟล์ผลลัพธ์ (ไม่ต้องใส่นามสกุล)")
+    merge.add_argument("--formats", default="csv,xlsx", help="รูปแบบไฟล์ผลลัพธ์ คั่นด้วย ,")
+    return parser
+
+async def run_scrape(args):
+    keywords = read_keywords(args.keywords_file, args.keywords)
+    if not keywords:
+        print("❌ ไม่มีคำค้น ระบุคำค้นเป็นอาร์กิวเมนต์หรือด้วย --keywords-file")
+        return 2
+    keywords = select_shard(keywords, args.shard)
+    prefix = args.prefix
+    if args.shard:
+        prefix = f"{prefix}_shard{args.shard[0]}of{args.shard[1]}"
+        print(f"🧩 shard {args.shard[0]}/{args.shard[1]}: {len(keywords)} คำค้น")
+    if not keywords:
+        print("ℹ️ shard นี้ไม่มีคำค้นที่ต้องดึง")
+        return 0
+    print(f"🔎 คำค้นที่ใช้: {keywords}")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    scraper = MyTCASScraper(
+        concurrency=args.concurrency, rate=args.rate, burst=args.burst, use_http=not args.no_http,
+        retries=args.retries, request_filter=RequestFilter(DEFAULT_ALLOWED_HOSTS + tuple(args.allow_host)),
+        search_snapshot_dir=args.search_snapshots, search_snapshot_max_age=args.snapshot_hours * 3600,
+        store=ProgramStore(args.store),
+        history=None if args.no_history else HistoryStore(args.history),
+        resume_max_age=args.resume_hours * 3600 if args.resume_hours is not None else None,
+        output_prefix=os.path.join(args.out_dir, prefix),
+        output_formats=[fmt.strip() for fmt in args.formats.split(",") if fmt.strip()],
+    )
+    await scraper.scrape(keywords)
+    scraper.save_data()
+    return 0
+
+async def interactive_main():
     print("=== MyTCAS Scraper ===")
     print("เลือกคำค้น:")
     print("1) วิศวกรรม ปัญญาประดิษฐ์")
@@ -241,9 +1133,23 @@ async def main():
 
     print(f"🔎 คำค้นที่ใช้: {keywords}")
 
-    scraper = MyTCASScraper()
+    resume = input("ดึงต่อจากรอบก่อนหน้า ข้ามหลักสูตรที่ดึงแล้วภายใน 24 ชม.? (y/N): ").strip().lower() == "y"
+
+    scraper = MyTCASScraper(store=ProgramStore(), history=HistoryStore(),
+                            resume_max_age=24 * 3600 if resume else None)
     await scraper.scrape(keywords)
     scraper.save_data()
 
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        asyncio.run(interactive_main())
+        return 0
+    args = build_parser().parse_args(argv)
+    if args.command == "merge":
+        merge_outputs(args.inputs, args.output, [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()])
+        return 0
+    return asyncio.run(run_scrape(args))
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import dashboard
+
+SOURCE = pd.read_csv(os.path.join(os.path.dirname(__file__), 'mytcas_scrape.csv'))
+
+
+def write_scrape(path, rows, age_seconds):
+    rows.to_excel(path, index=False)
+    stamp = time.time() - age_seconds
+    os.utime(path, (stamp, stamp))
+    return str(path)
+
+
+@pytest.fixture
+def live(tmp_path, monkeypatch):
+    monkeypatch.setattr(dashboard, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(dashboard, '_rejected_files', {})
+    current = write_scrape(tmp_path / 'mytcas_scrape.xlsx', SOURCE.head(10), 600)
+    monkeypatch.setattr(dashboard, 'data', dashboard.load_dashboard_data(current))
+    return tmp_path
+
+
+def test_shard_and_job_outputs_are_not_swapped_in(live):
+    full = write_scrape(live / 'mytcas_scraped_20260101_120000.xlsx', SOURCE, 300)
+    write_scrape(live / 'mytcas_scraped_shard1of4_20260101_130000.xlsx', SOURCE.head(3), 200)
+    write_scrape(live / 'mytcas_scraped_job2_20260101_140000.xlsx', SOURCE.head(4), 100)
+
+    assert dashboard.reload_if_changed()
+    assert dashboard.data.source == full
+    assert not dashboard.reload_if_changed()
+
+
+def test_merged_output_is_swapped_in(live):
+    merged = write_scrape(live / 'mytcas_scraped_merged.xlsx', SOURCE, 100)
+
+    assert dashboard.reload_if_changed()
+    assert dashboard.data.source == merged
+
+
+def test_rejected_newest_file_falls_back_to_next_candidate(live):
+    valid = write_scrape(live / 'mytcas_scraped_20260101_120000.xlsx', SOURCE, 300)
+    empty = write_scrape(live / 'mytcas_scraped_20260101_130000.xlsx', SOURCE.head(0), 100)
+
+    assert dashboard.reload_if_changed()
+    assert dashboard.data.source == valid
+    assert dashboard._rejected_files[empty] == dashboard.file_signature(empty)
+    assert not dashboard.reload_if_changed()
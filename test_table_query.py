@@ -0,0 +1,44 @@
+import pandas as pd
+
+from dashboard import apply_table_query, split_filter_part
+
+FRAME = pd.DataFrame({
+    'university': pd.Categorical(['จุฬาลงกรณ์มหาวิทยาลัย', 'Mahidol University', 'mahidol university', None]),
+    'tuition_fee': ['25,000', '9000', '100000', 'ดูรายละเอียด'],
+    'fee': [25000.0, 9000.0, 100000.0, None],
+})
+
+
+def matched(query):
+    return list(apply_table_query(FRAME, query, None).index)
+
+
+def test_operator_prefix_sets_case_sensitivity():
+    assert split_filter_part('{university} icontains mahidol') == ('university', 'contains', 'mahidol', True)
+    assert split_filter_part('{university} scontains mahidol') == ('university', 'contains', 'mahidol', False)
+    assert split_filter_part('{university} contains mahidol') == ('university', 'contains', 'mahidol', False)
+    assert split_filter_part('{university} bogus x') == (None, None, None, False)
+
+
+def test_insensitive_operators_lowercase_both_sides():
+    assert matched('{university} contains Mahidol') == [1]
+    assert matched('{university} icontains MAHIDOL') == [1, 2]
+    assert matched('{university} i= "MAHIDOL UNIVERSITY"') == [1, 2]
+    assert matched('{university} s= "Mahidol University"') == [1]
+    assert matched('{university} ine "mahidol university"') == [0, 3]
+
+
+def test_numeric_column_compares_numbers():
+    assert matched('{fee} > 10000') == [0, 2]
+    assert matched('{fee} <= 9000') == [1]
+    assert matched('{fee} = 25000') == [0]
+    assert matched('{fee} > abc') == []
+
+
+def test_text_column_relational_operand_by_type():
+    # ตัวเลข: เทียบกับแถวที่อ่านเป็นตัวเลขได้ ไม่ใช่ลำดับตัวอักษร ("9000" > "10000")
+    assert matched('{tuition_fee} > 10000') == [0, 2]
+    assert matched('{tuition_fee} < 10000') == [1]
+    # ข้อความ: เทียบตามลำดับตัวอักษร
+    assert matched('{university} < "N"') == [1]
+    assert matched('{university} i< "n"') == [1, 2]
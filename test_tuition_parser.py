@@ -0,0 +1,46 @@
+import math
+
+import pandas as pd
+
+from tuition_parser import TERMS_PER_YEAR, parse_tuition_fees
+
+
+def parse_one(text):
+    return parse_tuition_fees(pd.Series([text])).iloc[0]
+
+
+def test_bare_amount_has_unknown_unit_and_no_per_year_fee():
+    for text in ["232,000", "72,610 บาท", "15000", "15000.-"]:
+        row = parse_one(text)
+        assert row['tuition_fee_unit'] == 'unknown', text
+        assert row['tuition_fee_amount'] > 0, text
+        assert math.isnan(row['tuition_fee_per_year']), text
+
+
+def test_amount_without_unit_has_no_per_year_fee():
+    row = parse_one("ค่าธรรมเนียม 50,000 บาท")
+    assert row['tuition_fee_unit'] == 'unknown'
+    assert row['tuition_fee_amount'] == 50000.0
+    assert math.isnan(row['tuition_fee_per_year'])
+
+
+def test_explicit_units():
+    assert parse_one("30000 บาท/เทอม")['tuition_fee_per_year'] == 30000.0 * TERMS_PER_YEAR
+    assert parse_one("อัตราค่าเล่าเรียน 28,000.-/ภาคการศึกษา")['tuition_fee_unit'] == 'term'
+    assert parse_one("ปีละ 40,000 บาท")['tuition_fee_per_year'] == 40000.0
+    assert parse_one("อัตราค่าเล่าเรียน 321,000 บาท ตลอดหลักสูตร")['tuition_fee_unit'] == 'program'
+
+
+def test_url_only_fee():
+    row = parse_one("ดูรายละเอียดเพิ่มเติม https://www.example.ac.th/tuition")
+    assert row['tuition_fee_url'] == "https://www.example.ac.th/tuition"
+    assert math.isnan(row['tuition_fee_amount'])
+
+
+def test_repeated_and_missing_text_keep_row_order():
+    fees = pd.Series(["เทอมละ 12,000 บาท", None, "เทอมละ 12,000 บาท", "ปีละ 40,000 บาท"], index=[10, 11, 12, 13])
+    parsed = parse_tuition_fees(fees)
+    assert list(parsed.index) == [10, 11, 12, 13]
+    assert parsed['tuition_fee_unit'].isna().tolist() == [False, True, False, False]
+    assert parsed['tuition_fee_unit'].iloc[[0, 2, 3]].tolist() == ['term', 'term', 'year']
+    assert parsed['tuition_fee_per_year'].iloc[[0, 2, 3]].tolist() == [24000.0, 24000.0, 40000.0]
@@ -0,0 +1,113 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# แยกข้อความค่าเล่าเรียนเป็น จำนวนเงินแรกที่พบ, หน่วยของจำนวนนั้น (ภาคการศึกษา/ปี/ตลอดหลักสูตร),
+# กลุ่มผู้เรียน (ไทย/ต่างชาติ), ลิงก์รายละเอียด และค่าเล่าเรียนที่ปรับเป็นต่อปีแล้ว
+# parse ทีละข้อความด้วย regex ที่ compile ไว้ แต่ทำเฉพาะข้อความที่ไม่ซ้ำ (pd.factorize) ซึ่งมีน้อยกว่าจำนวนแถวมาก
+# (การใช้ Series.str.* หลายรอบช้ากว่าการวนทีละข้อความเมื่อข้อความส่วนใหญ่ไม่ซ้ำกัน)
+
+TERMS_PER_YEAR = 2          # นับเฉพาะภาคต้นและภาคปลาย ไม่รวมภาคฤดูร้อน
+DEFAULT_PROGRAM_YEARS = 4   # ใช้เมื่อข้อความไม่ระบุระยะเวลาของหลักสูตร
+
+URL_RE = re.compile(r'https?://\S+')
+# จำนวนเงินแรกที่พบ อย่างน้อย 1,000 บาท (ตัดตัวเลขเล็ก ๆ เช่น "6 ภาคการศึกษา" หรือ "กยศ.2" ออก)
+# พร้อมข้อความหลังตัวเลข ส่วนข้อความก่อนตัวเลขตัดมาเพียง BEFORE_WINDOW ตัวอักษร
+# (?=\d) ให้ regex ข้ามตำแหน่งที่ไม่ใช่ตัวเลขได้เร็ว
+AMOUNT_RE = re.compile(r'(?=\d)(?P<amount>\d{1,3}(?:,\d{3})+|\d{4,})(?:\.\d+)?(?P<after>\D{0,30})')
+BEFORE_WINDOW = 30
+PROGRAM_YEARS_RE = re.compile(r'หลักสูตร\s*(?P<years>\d)\s*ปี|เรียน\s*(?P<terms>\d{1,2})\s*(?:ภาค|เทอม)')
+
+UNIT_PATTERNS = [
+    ('program', r'ตลอดหลักสูตร|ทั้งหลักสูตร'),
+    ('term', r'เทอม|ภาคการศึกษา|ภาคเรียน|/\s*ภาค|ต่อภาค|semester|term'),
+    ('year', r'ต่อปี|/\s*ปี|ปีละ|year'),
+]
+# "เทอมละ 12,000" — หน่วยที่ติดอยู่หน้าตัวเลขมีน้ำหนักกว่าคำที่ตามมา (เช่น "... ตลอดหลักสูตร 96,000")
+# ทุก pattern ลงท้ายด้วย "ละ" ก่อนตัวเลข จึงตรวจด้วย endswith ก่อนใช้ regex
+LEADING_UNIT_PATTERNS = [
+    ('term', r'(?:เทอม|ภาคการศึกษา|ภาคเรียน)ละ\s*$'),
+    ('year', r'ปีละ\s*$'),
+]
+NATIONALITY_PATTERNS = [
+    ('foreign', r'ต่างชาติ|ต่างประเทศ|foreign|international student'),
+    ('thai', r'ชาวไทย|นักศึกษาไทย|สัญชาติไทย'),
+]
+
+RESULT_COLUMNS = ['tuition_fee_amount', 'tuition_fee_unit', 'tuition_fee_nationality', 'tuition_fee_url',
+                  'tuition_fee_per_year']
+
+
+def _compile(patterns):
+    """(regex รวมทุก pattern, [(ชื่อ, regex)]) regex รวมใช้ตัดข้อความที่ไม่ตรงกลุ่มใดเลยด้วยการค้นหาครั้งเดียว
+    pattern เป็นตัวพิมพ์เล็กและเทียบกับข้อความที่ lower() แล้ว (re.IGNORECASE ช้ามากกับข้อความภาษาไทย)"""
+    return (re.compile('|'.join(pattern for _, pattern in patterns)),
+            [(name, re.compile(pattern)) for name, pattern in patterns])
+
+
+UNIT_RES = _compile(UNIT_PATTERNS)
+LEADING_UNIT_RES = _compile(LEADING_UNIT_PATTERNS)
+NATIONALITY_RES = _compile(NATIONALITY_PATTERNS)
+UNIT_FACTORS = {'term': TERMS_PER_YEAR, 'year': 1.0}
+
+
+def _classify(text, patterns, default):
+    """คืนชื่อกลุ่มแรกที่ pattern ตรงกับข้อความ"""
+    any_pattern, named = patterns
+    if any_pattern.search(text):
+        for name, pattern in named:
+            if pattern.search(text):
+                return name
+    return default
+
+
+def parse_tuition_fee(text):
+    """แยกข้อความค่าเล่าเรียนหนึ่งข้อความ คืน (amount, unit, nationality, url, per_year)
+
+    ข้อความที่มีแต่จำนวนเงิน (เช่น "232,000") หรือไม่ระบุหน่วยได้หน่วย 'unknown' และไม่มีค่าต่อปี (NaN)
+    เพราะจำนวนเดียวกันอาจเป็นค่าต่อภาคการศึกษาหรือตลอดหลักสูตรก็ได้"""
+    url = URL_RE.search(text)
+    if url:
+        text = URL_RE.sub(' ', text)
+    text = text.lower()
+    nationality = _classify(text, NATIONALITY_RES, 'unspecified')
+    match = AMOUNT_RE.search(text)
+    if not match:
+        return np.nan, None, nationality, url and url.group(), np.nan
+    amount = float(match['amount'].replace(',', ''))
+
+    # หน่วยดูจาก "...ละ" หน้าตัวเลขก่อน แล้วจึงข้อความหลังตัวเลข ("30000 บาท/เทอม")
+    # และสุดท้ายข้อความก่อนตัวเลข ("ตลอดหลักสูตร 321000")
+    before = text[max(0, match.start() - BEFORE_WINDOW):match.start()]
+    unit = _classify(before, LEADING_UNIT_RES, None) if before.rstrip().endswith('ละ') else None
+    unit = unit or _classify(match['after'], UNIT_RES, None) or _classify(before, UNIT_RES, 'unknown')
+
+    if unit == 'program':
+        years = PROGRAM_YEARS_RE.search(text)
+        if years is None:
+            program_years = DEFAULT_PROGRAM_YEARS
+        elif years['years']:
+            program_years = int(years['years'])
+        else:
+            program_years = int(years['terms']) / TERMS_PER_YEAR
+        factor = 1 / program_years
+    else:
+        # ไม่ระบุหน่วย (unknown): ไม่เดาหน่วย จึงไม่มีค่าต่อปี (ยังมี tuition_fee_amount ให้แสดงในตาราง)
+        factor = UNIT_FACTORS.get(unit, np.nan)
+    return amount, unit, nationality, url and url.group(), round(amount * factor, 2)
+
+
+def parse_tuition_fees(fees):
+    """แปลง Series ของข้อความค่าเล่าเรียนเป็น DataFrame:
+    tuition_fee_amount, tuition_fee_unit, tuition_fee_nationality, tuition_fee_url, tuition_fee_per_year
+
+    ข้อความค่าเล่าเรียนซ้ำกันมาก (หลักสูตรเดียวกันหลายคำค้น/หลายรอบการดึง) จึง parse เฉพาะค่าที่ไม่ซ้ำ
+    แล้วกระจายผลกลับด้วยรหัสจาก pd.factorize"""
+    codes, uniques = pd.factorize(fees.astype('string').fillna(''))
+    parsed = pd.DataFrame([parse_tuition_fee(text) for text in uniques.to_numpy()], columns=RESULT_COLUMNS)
+    parsed = parsed.astype({'tuition_fee_amount': 'float64', 'tuition_fee_per_year': 'float64',
+                            'tuition_fee_url': 'string'})
+    result = parsed.iloc[codes]
+    result.index = fees.index
+    return result